@@ -0,0 +1,78 @@
+"""
+Compiled per-frame kernels for the bowling analyzer.
+Numba is optional - without it the kernels run as plain Python.
+"""
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def release_consistency(elbow_angles, wrists, valid, threshold=40.0):
+    """
+    Single pass over frames: pick frames whose elbow angle is below threshold
+    and accumulate the wrist x/y spread with Welford's algorithm.
+
+    :param elbow_angles: (N,) elbow angles in degrees (NaN = not measured)
+    :param wrists: (N, 3) wrist x, y, z per frame
+    :param valid: (N,) frames with a usable pose
+    :return: (release frame indices, x std, y std) - population std like np.std
+    """
+    n = elbow_angles.shape[0]
+    release_idx = np.empty(n, dtype=np.int64)
+    count = 0
+    mean_x = 0.0
+    mean_y = 0.0
+    m2_x = 0.0
+    m2_y = 0.0
+
+    for i in range(n):
+        if valid[i] and elbow_angles[i] < threshold:
+            release_idx[count] = i
+            count += 1
+
+            dx = wrists[i, 0] - mean_x
+            mean_x += dx / count
+            m2_x += dx * (wrists[i, 0] - mean_x)
+
+            dy = wrists[i, 1] - mean_y
+            mean_y += dy / count
+            m2_y += dy * (wrists[i, 1] - mean_y)
+
+    if count == 0:
+        return release_idx[:0], 0.0, 0.0
+    return release_idx[:count], math.sqrt(m2_x / count), math.sqrt(m2_y / count)
+
+
+# Bowling compliance verdict bits (see bowling_verdict)
+VERDICT_ELBOW_WARNING = 1
+VERDICT_ELBOW_ILLEGAL = 2
+VERDICT_NO_BALL = 4
+
+
+@njit(cache=True)
+def bowling_verdict(elbow_ext, front_foot_no_ball, elbow_limit, elbow_warning):
+    """
+    Numeric part of the ICC bowling check as a bit set (0 = legal):
+    VERDICT_ELBOW_ILLEGAL above elbow_limit, else VERDICT_ELBOW_WARNING above
+    elbow_warning, plus VERDICT_NO_BALL for a front-foot no-ball.
+    """
+    code = 0
+    if elbow_ext > elbow_limit:
+        code |= VERDICT_ELBOW_ILLEGAL
+    elif elbow_ext > elbow_warning:
+        code |= VERDICT_ELBOW_WARNING
+    if front_foot_no_ball:
+        code |= VERDICT_NO_BALL
+    return code
@@ -0,0 +1,59 @@
+"""
+Compiled scalar kernels for the pose service.
+Numba is optional - without it the kernels run as plain Python.
+"""
+import math
+
+from ._bowling_kernels import NUMBA_AVAILABLE, njit
+
+try:
+    from numba import prange
+except ImportError:
+    prange = range
+
+
+@njit(cache=True, fastmath=True)
+def angle_deg(ax, ay, bx, by, cx, cy):
+    """
+    Angle in degrees at vertex b for 2-D points a, b, c.
+    Returns NaN when either arm has zero length.
+    """
+    ux = ax - bx
+    uy = ay - by
+    vx = cx - bx
+    vy = cy - by
+    n = math.sqrt((ux * ux + uy * uy) * (vx * vx + vy * vy))
+    if n == 0.0:
+        return math.nan
+    c = (ux * vx + uy * vy) / n
+    if c > 1.0:
+        c = 1.0
+    elif c < -1.0:
+        c = -1.0
+    return math.degrees(math.acos(c))
+
+
+@njit(parallel=True, cache=True)
+def process_landmarks_batch(L, arms, min_visibility, out_angles, out_visible):
+    """
+    Fused per-frame pass over a (N, 33, 4) landmark stack.
+
+    :param arms: (A, 3) shoulder, elbow, wrist indices, one row per arm
+    :param out_angles: (N, A + 1) float32; elbow angle per arm (NaN when an
+        arm joint is not above min_visibility), last column shoulder tilt
+    :param out_visible: (N, A) bool, arm fully visible
+    """
+    n = L.shape[0]
+    n_arms = arms.shape[0]
+    for i in prange(n):
+        for a in range(n_arms):
+            s, e, w = arms[a, 0], arms[a, 1], arms[a, 2]
+            visible = min(L[i, s, 3], L[i, e, 3], L[i, w, 3]) > min_visibility
+            out_visible[i, a] = visible
+            if visible:
+                out_angles[i, a] = angle_deg(L[i, s, 0], L[i, s, 1], L[i, e, 0], L[i, e, 1], L[i, w, 0], L[i, w, 1])
+            else:
+                out_angles[i, a] = math.nan
+        # Shoulder tilt from the first two arms' shoulders (left, right)
+        out_angles[i, n_arms] = abs(L[i, arms[0, 0], 1] - L[i, arms[1, 0], 1])
+
@@ -1,9 +1,10 @@
 """
 AdvancedBallDetector - extends BallDetector with speed and spin estimation.
 """
+import threading
 import numpy as np
 from app.services.ball_detector import BallDetector
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
 class AdvancedBallDetector(BallDetector):
@@ -26,7 +27,7 @@ class AdvancedBallDetector(BallDetector):
     # Speed estimation
     # ------------------------------------------------------------------
 
-    def calculate_ball_speed(self, ball_trajectory: Dict) -> float:
+    def calculate_ball_speed(self, ball_trajectory: Dict) -> Optional[float]:
         """
         Estimate average ball speed in km/h from the trajectory dict returned
         by track_ball_trajectory().
@@ -35,26 +36,20 @@ class AdvancedBallDetector(BallDetector):
           - 'trajectory': list of {'frame', 'x', 'y'} dicts  (from BallDetector)
           - 'points_2d' : list of {'x', 'y'} dicts            (alternate schema)
 
-        Returns 0.0 when the trajectory is too short to compute speed.
+        Returns None when the trajectory is too short to compute speed.
         """
         if not ball_trajectory:
-            return 0.0
+            return None
 
         # Support two different trajectory schemas
         points = ball_trajectory.get("trajectory") or ball_trajectory.get("points_2d") or []
 
         if len(points) < 2:
-            return 0.0
+            return None
 
-        frame_displacements = []
-        for i in range(1, len(points)):
-            dx = points[i]["x"] - points[i - 1]["x"]
-            dy = points[i]["y"] - points[i - 1]["y"]
-            dist_pixels = float(np.sqrt(dx ** 2 + dy ** 2))
-            frame_displacements.append(dist_pixels)
-
-        if not frame_displacements:
-            return 0.0
+        xy = np.array([[p["x"], p["y"]] for p in points], dtype=np.float32)
+        steps = np.diff(xy, axis=0)
+        frame_displacements = np.hypot(steps[:, 0], steps[:, 1])
 
         avg_pixels_per_frame = float(np.mean(frame_displacements))
         meters_per_second = (avg_pixels_per_frame * self.fps) / self.pixels_per_meter
@@ -92,8 +87,8 @@ class AdvancedBallDetector(BallDetector):
         if len(centres) < 5:
             return 0.0
 
-        xs = np.array([c[0] for c in centres])
-        ys = np.array([c[1] for c in centres])
+        xs = np.array([c[0] for c in centres], dtype=np.float32)
+        ys = np.array([c[1] for c in centres], dtype=np.float32)
 
         # Overall direction vector
         direction = np.array([xs[-1] - xs[0], ys[-1] - ys[0]])
@@ -119,3 +114,15 @@ class AdvancedBallDetector(BallDetector):
         rpm = (revolutions / duration_seconds) * 60.0
 
         return round(max(rpm, 0.0), 1)
+
+
+_BALL_DETECTORS: Dict[str, AdvancedBallDetector] = {}
+_BALL_DETECTORS_LOCK = threading.Lock()
+
+
+def get_ball_detector(model_path: str = "models/cricket_ball_detector.pt") -> AdvancedBallDetector:
+    """Shared detector per model path, so the analyzers load YOLO once per process"""
+    with _BALL_DETECTORS_LOCK:
+        if model_path not in _BALL_DETECTORS:
+            _BALL_DETECTORS[model_path] = AdvancedBallDetector(model_path=model_path)
+        return _BALL_DETECTORS[model_path]
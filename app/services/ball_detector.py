@@ -1,19 +1,21 @@
-import cv2
 import numpy as np
 from ultralytics import YOLO
 from typing import List, Dict, Tuple
 import torch
 
+from app.services.frame_pipeline import iter_frame_batches
+from app.services.model_variants import MODEL_PRECISION, resolve_model_variant
+
 class BallDetector:
     def __init__(self, model_path: str = None):
         """
         Initialize ball detector using YOLOv8
         """
-        if model_path:
-            self.model = YOLO(model_path)
-        else:
-            # Load a pre-trained model (you can fine-tune it for cricket balls)
-            self.model = YOLO('yolov8n.pt')
+        # Load a pre-trained model by default (you can fine-tune it for cricket balls)
+        model_path = resolve_model_variant(model_path or 'yolov8n.pt')
+        self.model = YOLO(model_path)
+        # Exported engines carry their own precision; .pt weights run FP16 on request
+        self.half = MODEL_PRECISION == "fp16" and model_path.endswith(".pt")
         
         # Sports ball class in COCO dataset (class 32 = sports ball)
         self.ball_class_id = 32
@@ -21,48 +23,80 @@ class BallDetector:
     def detect_ball_in_video(self, video_path: str) -> List[Dict]:
         """
         Detect ball in video frames
+        Frames go through the model in batches of FRAME_BATCH_SIZE.
         """
-        cap = cv2.VideoCapture(video_path)
         detections = []
         frame_count = 0
         
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            # Run detection
-            results = self.model(frame, verbose=False)
-            
-            frame_detections = []
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Check if it's a ball
-                        if int(box.cls) == self.ball_class_id:
-                            detection = {
-                                "frame": frame_count,
-                                "bbox": box.xyxy[0].tolist(),
-                                "confidence": float(box.conf),
-                                "class": int(box.cls)
-                            }
-                            frame_detections.append(detection)
-            
-            if frame_detections:
-                detections.extend(frame_detections)
-            
-            frame_count += 1
+        for batch in iter_frame_batches(video_path, rgb=False):
+            detections.extend(self.process_frames(frame_count, batch))
+            frame_count += len(batch)
+        
+        return detections
+    
+    def process_frames(self, first_frame_number: int, frames_bgr: np.ndarray) -> List[Dict]:
+        """
+        Detect the ball in a batch of consecutive BGR frames with one model call
+        """
+        results = self.model(list(frames_bgr), verbose=False, half=self.half)
         
-        cap.release()
+        detections = []
+        for frame_number, result in enumerate(results, first_frame_number):
+            detections.extend(self._ball_detections(frame_number, result))
         return detections
     
+    def process_frame(self, frame_number: int, frame_bgr: np.ndarray, frame_rgb: np.ndarray = None,
+                      fps: float = None) -> List[Dict]:
+        """
+        Detect the ball in one decoded BGR frame (FramePipeline consumer)
+        """
+        # Run detection
+        results = self.model(frame_bgr, verbose=False, half=self.half)
+        
+        frame_detections = []
+        for result in results:
+            frame_detections.extend(self._ball_detections(frame_number, result))
+        
+        return frame_detections
+    
+    def _ball_detections(self, frame_number: int, result) -> List[Dict]:
+        """
+        Ball boxes from one frame's model result
+        """
+        frame_detections = []
+        boxes = result.boxes
+        if boxes is not None:
+            for box in boxes:
+                # Check if it's a ball
+                if int(box.cls) == self.ball_class_id:
+                    detection = {
+                        "frame": frame_number,
+                        "bbox": box.xyxy[0].tolist(),
+                        "confidence": float(box.conf),
+                        "class": int(box.cls)
+                    }
+                    frame_detections.append(detection)
+        
+        return frame_detections
+    
     def track_ball_trajectory(self, video_path: str) -> Dict:
         """
         Track ball trajectory throughout video
         """
+        return self.detect_and_track(video_path)[1]
+    
+    def detect_and_track(self, video_path: str) -> Tuple[List[Dict], Dict]:
+        """
+        Detect the ball and build its trajectory from a single pass over the video
+        Returns: (detections, trajectory)
+        """
         detections = self.detect_ball_in_video(video_path)
-        
+        return detections, self.trajectory_from_detections(detections)
+    
+    def trajectory_from_detections(self, detections: List[Dict]) -> Dict:
+        """
+        Build the trajectory dict from per-frame detections
+        """
         # Group detections by frame
         frames_dict = {}
         for detection in detections:
@@ -94,14 +128,11 @@ class BallDetector:
         # Calculate speed and direction (simplified)
         if len(trajectory) > 1:
             # Estimate speed (pixels per frame)
-            speeds = []
-            for i in range(1, len(trajectory)):
-                dx = trajectory[i]["x"] - trajectory[i-1]["x"]
-                dy = trajectory[i]["y"] - trajectory[i-1]["y"]
-                speed = np.sqrt(dx**2 + dy**2)
-                speeds.append(speed)
+            xy = np.array([[p["x"], p["y"]] for p in trajectory], dtype=np.float32)
+            steps = np.diff(xy, axis=0)
+            speeds = np.hypot(steps[:, 0], steps[:, 1])
             
-            avg_speed = np.mean(speeds) if speeds else 0
+            avg_speed = np.mean(speeds)
         else:
             avg_speed = 0
         
@@ -1,50 +1,64 @@
+import math
+import threading
 import numpy as np
-from typing import Dict, List
-from .pose_service import PoseDetector
-from .advanced_ball_detector import AdvancedBallDetector  # NEW
+from typing import TYPE_CHECKING, Dict, List, Optional
+from .pose_service import NOSE, SHOULDER_L, SHOULDER_R, X, PoseDetector, pose_detector as _shared_pose_detector
+from .advanced_ball_detector import get_ball_detector  # NEW
+from .frame_pipeline import FramePipeline
+
+if TYPE_CHECKING:
+    from app.core.models import Delivery
+
+# Shot direction by sign of post-contact x movement: 0 -> straight, +1 -> right, -1 -> left
+_DIRECTION_LABELS = ("straight", "midwicket", "cover")
+
+# Classification / recommendation thresholds
+_DIRECTION_THRESH = np.float32(0.1)   # normalized x movement after contact
+_STANCE_THRESH = np.float32(0.05)     # normalized shoulder x offset
+_STILLNESS_THRESH = 5                 # head stillness score
+_FRONT_WEIGHT_THRESH = 40             # % weight on front foot
+
 class BattingAnalyzer:
-    def __init__(self):
-        self.pose_detector = PoseDetector()
-        self.ball_detector = AdvancedBallDetector(model_path="models/cricket_ball_detector.pt")  # NEW
-        
-    def analyze_video(self, video_path: str) -> Dict:
+    def __init__(self, pose_detector: Optional[PoseDetector] = None):
+        self.pose_detector = pose_detector or _shared_pose_detector
+        self.ball_detector = get_ball_detector()
+        # Deliveries waiting to be written by flush_deliveries()
+        self._pending_deliveries: List["Delivery"] = []
+        self._pending_lock = threading.Lock()
+        
+    def analyze_video(self, video_path: str, session_id: Optional[int] = None,
+                      pose_report: Optional[Dict] = None) -> Dict:
         """
         Main function to analyze batting video with ball tracking
+        Pass pose_report (from PoseDetector) to reuse pose data already computed for this video.
         """
-        # Get pose data
-        pose_report = self.pose_detector.process_video(video_path)
+        if pose_report is None:
+            # Get pose data and ball tracking from a single decode of the video
+            pipeline = FramePipeline(video_path)
+            with self.pose_detector.video_consumer() as process_pose:
+                pose_frames, ball_frames = pipeline.run(
+                    [process_pose, self.ball_detector.process_frame], parallel=True
+                )
+            pose_report = self.pose_detector.create_report(pose_frames, pipeline.fps, pipeline.frame_count)
+            ball_detections = [det for frame_dets in ball_frames for det in frame_dets]
+        else:
+            # Ball only: frames go through the model in batches
+            ball_detections = self.ball_detector.detect_ball_in_video(video_path)
         frames = pose_report.get("frames", [])
         
-        # Ball tracking
-        ball_detections = self.ball_detector.detect_ball_in_video(video_path)
-        ball_trajectory = self.ball_detector.track_ball_trajectory(video_path)
+        ball_trajectory = self.ball_detector.trajectory_from_detections(ball_detections)
+        self._trajectory_arrays(ball_trajectory)
         
         # Detect bat contact (combine pose and ball)
         contact_frame, contact_point = self.detect_bat_contact(frames, ball_trajectory)
 
+        phases = self.detect_batting_phases(frames)
+
         shot_type = self.classify_shot_type(ball_trajectory, contact_point)
         shot_direction = self.classify_shot_direction(ball_trajectory, contact_point)
 
-        if session_id:
-            db = SessionLocal()
-            try:
-                delivery = Delivery(
-                    session_id=session_id,
-                    delivery_number=1,
-                    speed_kmh=metrics.get("ball_speed_faced"),
-                    shot_power=metrics.get("shot_power"),
-                    shot_timing=metrics.get("shot_timing"),
-                    shot_type=shot_type,
-                    shot_direction=shot_direction,
-                    runs=metrics.get("runs_predicted", 0),
-                )
-                db.add(delivery)
-                db.commit()
-            finally:
-                db.close()
-                
         # Calculate batting metrics
-        metrics = self.calculate_batting_metrics(frames)
+        metrics = self.calculate_batting_metrics(frames, phases)
         
         # Add ball-based metrics
         metrics["ball_speed_faced"] = self.ball_detector.calculate_ball_speed(ball_trajectory)
@@ -53,8 +67,8 @@ class BattingAnalyzer:
         metrics["runs_predicted"] = self.predict_runs(ball_trajectory, metrics["shot_power"])
         metrics["contact_point"] = contact_point
 
-        # Save to database if session_id provided
-        if session_id:
+        # Save to database if session_id provided and the bat met the ball
+        if session_id and contact_point:
             self._save_delivery_to_db(session_id, ball_trajectory, metrics.get("ball_speed_faced"), 
                                       metrics, shot_type, shot_direction)
         # Generate recommendations
@@ -87,45 +101,50 @@ class BattingAnalyzer:
         if not ball_trajectory or "points_2d" not in ball_trajectory:
             return None, None
         
-        ball_points = ball_trajectory["points_2d"]
-        if len(ball_points) < 2:
+        xy, frame_ids = self._trajectory_arrays(ball_trajectory)
+        if len(xy) < 2:
             return None, None
         
         # Simplified: look for sudden change in ball direction (impact)
         # You can also use bat position from pose if available
-        for i in range(1, len(ball_points)):
-            dx = ball_points[i]["x"] - ball_points[i-1]["x"]
-            dy = ball_points[i]["y"] - ball_points[i-1]["y"]
-            speed = np.sqrt(dx**2 + dy**2)
-            if speed > 0.1:  # threshold
-                # Candidate contact frame
-                return ball_points[i]["frame"], {"x": ball_points[i]["x"], "y": ball_points[i]["y"]}
-        
-        return None, None
+        steps = np.diff(xy, axis=0)
+        fast = np.flatnonzero((steps * steps).sum(axis=1) > 0.01)  # speed threshold of 0.1, compared squared
+        if fast.size == 0:
+            return None, None
+        
+        # Candidate contact frame
+        i = int(fast[0]) + 1
+        return int(frame_ids[i]), {"frame": int(frame_ids[i]), "x": float(xy[i, 0]), "y": float(xy[i, 1])}
+
+    @staticmethod
+    def _trajectory_arrays(ball_trajectory: Dict):
+        """
+        Return (xy, frames) arrays for points_2d, cached on the trajectory dict
+        """
+        if "_xy" not in ball_trajectory:
+            points = ball_trajectory.get("points_2d", [])
+            ball_trajectory["_xy"] = np.array(
+                [[p["x"], p["y"]] for p in points], dtype=np.float32
+            ).reshape(-1, 2)
+            ball_trajectory["_frames"] = np.array(
+                [p.get("frame", -1) for p in points], dtype=np.int32
+            )
+        return ball_trajectory["_xy"], ball_trajectory["_frames"]
 
     def detect_batting_phases(self, frames: List[Dict]) -> Dict:
         """
-        Detect different phases of batting
+        Detect different phases of batting as frame slices
         """
-        phases = {
-            "stance": [],
-            "backlift": [],
-            "shot_execution": [],
-            "follow_through": []
-        }
-        
-        # Simplified phase detection
-        for i, frame in enumerate(frames):
-            if i < len(frames) * 0.3:
-                phases["stance"].append(i)
-            elif i < len(frames) * 0.6:
-                phases["backlift"].append(i)
-            elif i < len(frames) * 0.9:
-                phases["shot_execution"].append(i)
-            else:
-                phases["follow_through"].append(i)
+        # Simplified phase detection: fixed fractions of the clip
+        n = len(frames)
+        b1, b2, b3 = math.ceil(n * 0.3), math.ceil(n * 0.6), math.ceil(n * 0.9)
         
-        return phases
+        return {
+            "stance": slice(0, b1),
+            "backlift": slice(b1, b2),
+            "shot_execution": slice(b2, b3),
+            "follow_through": slice(b3, n)
+        }
     
     def calculate_batting_metrics(self, frames: List[Dict], phases: Dict) -> Dict:
         """
@@ -134,8 +153,7 @@ class BattingAnalyzer:
         metrics = {}
         
         # Analyze stance
-        stance_frames = [frames[i] for i in phases["stance"] if i < len(frames)]
-        metrics.update(self.analyze_stance(stance_frames))
+        metrics.update(self.analyze_stance(frames[phases["stance"]]))
         
         # Analyze weight distribution
         metrics["weight_distribution"] = self.calculate_weight_distribution(frames)
@@ -162,15 +180,12 @@ class BattingAnalyzer:
         if len(landmarks) < 13:  # Need shoulder landmarks
             return {"stance_type": "unknown"}
         
-        left_shoulder = landmarks[11]
-        right_shoulder = landmarks[12]
-        
         # Determine stance based on shoulder alignment
-        shoulder_diff = left_shoulder["x"] - right_shoulder["x"]
+        shoulder_diff = landmarks[SHOULDER_L, X] - landmarks[SHOULDER_R, X]
         
-        if shoulder_diff > 0.05:
+        if shoulder_diff > _STANCE_THRESH:
             return {"stance_type": "open_stance"}
-        elif shoulder_diff < -0.05:
+        elif shoulder_diff < -_STANCE_THRESH:
             return {"stance_type": "closed_stance"}
         else:
             return {"stance_type": "square_stance"}
@@ -198,17 +213,15 @@ class BattingAnalyzer:
         """
         Analyze head stillness
         """
-        head_positions = []
-        for frame in frames:
-            landmarks = frame.get("landmarks", [])
-            if len(landmarks) > 0:  # Nose landmark index 0
-                nose = landmarks[0]
-                head_positions.append([nose["x"], nose["y"]])
+        # Nose x, y from every frame with a pose
+        head_positions = [
+            frame["landmarks"][NOSE, :2] for frame in frames if len(frame.get("landmarks", ()))
+        ]
         
         if not head_positions:
             return {"stillness": 0, "movement": 0}
         
-        head_positions = np.array(head_positions)
+        head_positions = np.stack(head_positions)
         movement = np.std(head_positions, axis=0).sum()
         stillness = max(0, 10 - movement)  # Higher is better
         
@@ -230,12 +243,12 @@ class BattingAnalyzer:
         # Weight distribution
         weight_dist = metrics.get("weight_distribution", {})
         front_weight = weight_dist.get("front_foot", 50)
-        if front_weight < 40:
+        if front_weight < _FRONT_WEIGHT_THRESH:
             recommendations.append("Consider transferring more weight to front foot during shot")
         
         # Head position
         head_pos = metrics.get("head_position", {})
-        if head_pos.get("stillness", 0) < 5:
+        if head_pos.get("stillness", 0) < _STILLNESS_THRESH:
             recommendations.append("Work on keeping your head still during the shot")
         else:
             recommendations.append("Good head position - keep it up!")
@@ -249,25 +262,21 @@ class BattingAnalyzer:
         if not ball_trajectory or "points_2d" not in ball_trajectory or contact_frame is None:
             return 50.0  # default
         
-        points = ball_trajectory["points_2d"]
+        xy, frame_ids = self._trajectory_arrays(ball_trajectory)
         # Find index of contact
-        contact_idx = None
-        for i, p in enumerate(points):
-            if p.get("frame") == contact_frame:
-                contact_idx = i
-                break
+        contact_idx = int(np.searchsorted(frame_ids, contact_frame))
         
-        if contact_idx is None or contact_idx >= len(points)-1:
+        if contact_idx >= len(frame_ids)-1 or frame_ids[contact_idx] != contact_frame:
             return 50.0
         
         # Calculate speed after contact (next few frames)
-        after = points[contact_idx+1: min(contact_idx+5, len(points))]
+        after = xy[contact_idx+1:contact_idx+5]
         if len(after) < 2:
             return 50.0
         
-        dx = after[-1]["x"] - after[0]["x"]
-        dy = after[-1]["y"] - after[0]["y"]
-        distance = np.sqrt(dx**2 + dy**2)
+        # Path length over the post-contact frames, not just the endpoint chord
+        steps = np.diff(after, axis=0)
+        distance = float(np.hypot(steps[:, 0], steps[:, 1]).sum())
         # Rough conversion to power scale (0-100)
         power = min(distance * 1000, 100)
         return round(power, 1)
@@ -286,16 +295,16 @@ class BattingAnalyzer:
         if not ball_trajectory or "points_2d" not in ball_trajectory:
             return 0
         
-        points = ball_trajectory["points_2d"]
-        if len(points) < 2:
+        xy, _ = self._trajectory_arrays(ball_trajectory)
+        if len(xy) < 2:
             return 0
         
         # Check if ball ends near boundary (simplified)
-        last = points[-1]
-        # Assuming normalized coordinates, boundary is near edges (x near 0 or 1)
-        if last["x"] < 0.1 or last["x"] > 0.9 or last["y"] < 0.1 or last["y"] > 0.9:
+        last = xy[-1]
+        # Assuming normalized coordinates, boundary is near edges (x or y near 0 or 1)
+        if ((last < 0.1) | (last > 0.9)).any():
             # Check height to differentiate four vs six
-            if last["y"] < 0.2:  # high trajectory -> six
+            if last[1] < 0.2:  # high trajectory -> six
                 return 6
             else:
                 return 4
@@ -306,58 +315,82 @@ class BattingAnalyzer:
         else:
             return 0
     
-    def classify_shot_type(trajectory, contact_point):
-    # Simplified: based on bat angle and ball trajectory after contact
-    # For now, return a placeholder
+    def classify_shot_type(self, trajectory, contact_point):
+        # Simplified: based on bat angle and ball trajectory after contact
+        # For now, return a placeholder
         return "drive"
 
-    def classify_shot_direction(trajectory, contact_point):
-    # Determine direction based on ball's path after contact
-        if not trajectory or "points_2d" not in trajectory:
+    def classify_shot_direction(self, trajectory, contact_point):
+        # Determine direction based on ball's path after contact
+        if not trajectory or "points_2d" not in trajectory or not contact_point:
             return "straight"
-        points = trajectory["points_2d"]
-        if len(points) < 3:
+        xy, frame_ids = self._trajectory_arrays(trajectory)
+        if len(xy) < 3:
             return "straight"
         # Find point after contact
-        contact_idx = None
-        for i, p in enumerate(points):
-            if p.get("frame") == contact_point.get("frame"):
-                contact_idx = i
-                break
-        if contact_idx is None or contact_idx >= len(points)-1:
-            return "straight"
-        after = points[contact_idx+1]
-        dx = after["x"] - contact_point["x"]
-        if dx < -0.1:
-            return "cover"  # left side
-        elif dx > 0.1:
-            return "midwicket"  # right side
-        else:
+        contact_idx = int(np.searchsorted(frame_ids, contact_point.get("frame", -1)))
+        if contact_idx >= len(frame_ids)-1 or frame_ids[contact_idx] != contact_point.get("frame", -1):
             return "straight"
+        dx = float(xy[contact_idx+1, 0]) - contact_point["x"]
+        # cover = left side, midwicket = right side
+        return _DIRECTION_LABELS[int(np.sign(dx)) if abs(dx) > _DIRECTION_THRESH else 0]
 
-    def _save_delivery_to_db(self, session_id: int, ball_trajectory: dict, ball_speed: float, 
+    def _save_delivery_to_db(self, session_id: int, ball_trajectory: dict, ball_speed: Optional[float], 
                             metrics: dict, shot_type: str, shot_direction: str):
-        """Save batting delivery to database"""
-        from app.database import SessionLocal
+        """
+        Queue batting delivery for the database (written by flush_deliveries)
+        """
         from app.core.models import Delivery
 
+        # Nothing worth recording without ball speed or a bat contact
+        if ball_speed is None and not metrics.get("contact_point"):
+            return
+
         # Determine runs (from predict_runs)
         runs = metrics.get("runs_predicted", 0)
 
-        db = SessionLocal()
-        try:
-            # For now, assume one delivery per session (you can increment delivery_number later)
-            delivery = Delivery(
-                session_id=session_id,
-                delivery_number=1,
-                speed_kmh=ball_speed,
-                shot_power=metrics.get("shot_power"),
-                shot_timing=metrics.get("shot_timing"),
-                shot_type=shot_type,
-                shot_direction=shot_direction,
-                runs=runs
-            )
-            db.add(delivery)
+        # For now, assume one delivery per session (you can increment delivery_number later)
+        delivery = Delivery(
+            session_id=session_id,
+            delivery_number=1,
+            speed_kmh=ball_speed,
+            shot_power=metrics.get("shot_power"),
+            shot_timing=metrics.get("shot_timing"),
+            shot_type=shot_type,
+            shot_direction=shot_direction,
+            runs=runs
+        )
+        with self._pending_lock:
+            previous = []
+            if self._pending_deliveries and self._pending_deliveries[-1].session_id != session_id:
+                # A new session starts, so the previous one's deliveries are complete
+                previous, self._pending_deliveries = self._pending_deliveries, []
+            self._pending_deliveries.append(delivery)
+        self._write_deliveries(previous)
+
+    def flush_deliveries(self, session_id: Optional[int] = None) -> int:
+        """
+        Write queued deliveries in a single commit.
+        Deliveries queue up across analyze_video calls for one session and are
+        written when another session's delivery arrives; call this once after
+        the last video of a session. Pass session_id to flush only that session.
+        """
+        with self._pending_lock:
+            if session_id is None:
+                pending, self._pending_deliveries = self._pending_deliveries, []
+            else:
+                pending = [d for d in self._pending_deliveries if d.session_id == session_id]
+                self._pending_deliveries = [d for d in self._pending_deliveries if d.session_id != session_id]
+        return self._write_deliveries(pending)
+
+    def _write_deliveries(self, pending: List["Delivery"]) -> int:
+        """Insert deliveries in one transaction"""
+        if not pending:
+            return 0
+
+        from app.database import SessionLocal
+
+        with SessionLocal() as db:
+            db.add_all(pending)
             db.commit()
-        finally:
-            db.close()
\ No newline at end of file
+        return len(pending)
\ No newline at end of file
@@ -1,18 +1,149 @@
 import numpy as np
-from app.services.advanced_ball_detector import AdvancedBallDetector
-from typing import Dict, List, Tuple
-import cv2
-from scipy.spatial.transform import Rotation
-from .pose_service import PoseDetector
+from dataclasses import asdict, dataclass, field
+from app.services.advanced_ball_detector import get_ball_detector
+from typing import TYPE_CHECKING, Dict, List, Optional
+from .pose_service import PoseArrays, PoseDetector, pose_detector as _shared_pose_detector
+from .frame_pipeline import FramePipeline
+from ._bowling_kernels import release_consistency
 from app.analytics.pitch_mapping import classify_line, classify_length, get_line_length_score
-from app.core.models import Delivery
-from sqlalchemy import func
-from app.database import SessionLocal
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+# The DB layer (sqlalchemy, SessionLocal, Delivery) is imported inside the save
+# helpers so workers that only analyze never pay for it.
+
+# MediaPipe indices per side: shoulder, elbow, wrist, hip, knee, ankle
+_R_INDICES = np.array([12, 14, 16, 24, 26, 28], dtype=np.int32)
+_L_INDICES = np.array([11, 13, 15, 23, 25, 27], dtype=np.int32)
+_WRIST = 2  # position of the wrist within the index arrays
+_MIN_VISIBILITY = 0.5  # frames with any key joint below this are skipped in the metric math
+
+# Ball type by minimum post-release height bin (see classify_ball_type)
+_HEIGHT_BINS = np.array([0.2, 0.4, 0.8], dtype=np.float32)
+_BALL_TYPE_BY_HEIGHT = ("is_yorker", None, "is_full_toss", "is_bouncer")
+
+
+def _trajectory_xy(trajectory: Dict) -> np.ndarray:
+    """(M, 2) float32 array of points_2d x, y, cached on the trajectory dict"""
+    if "_xy" not in trajectory:
+        trajectory["_xy"] = np.array(
+            [[p["x"], p["y"]] for p in trajectory.get("points_2d", [])], dtype=np.float32
+        ).reshape(-1, 2)
+    return trajectory["_xy"]
+
+
+def _compact_trajectory(trajectory: Dict) -> Dict:
+    """
+    Keep only what the report and DB row read from a trajectory (summary,
+    final_position, pitch_landing and the cached (M, 2) array).
+    """
+    compact = {key: trajectory[key] for key in ("summary", "final_position", "pitch_landing") if key in trajectory}
+    compact["_xy"] = _trajectory_xy(trajectory)
+    return compact
+
+
+def _batch_dot(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Row-wise dot product over the last axis without a (..., k) temporary"""
+    return np.einsum("...i,...i->...", u, v)
+
+
+def _batch_norm(v: np.ndarray) -> np.ndarray:
+    """Row-wise Euclidean norm over the last axis"""
+    return np.sqrt(_batch_dot(v, v))
+
+
+def _vectorized_angle(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Angle in degrees at vertex b for batches of (..., 2) or (..., 3) points.
+    Uses atan2(|v1 x v2|, v1 . v2), which is stable near 0/180 degrees and
+    gives 0 for degenerate (zero-length) arms.
+    """
+    v1 = a - b
+    v2 = c - b
+    dot_product = _batch_dot(v1, v2)
+    if v1.shape[-1] == 2:
+        cross_norm = np.abs(v1[..., 0] * v2[..., 1] - v1[..., 1] * v2[..., 0])
+    else:
+        cross_norm = _batch_norm(np.cross(v1, v2))
+    
+    return np.degrees(np.arctan2(cross_norm, dot_product))
+
+
+@dataclass
+class FrameTensors:
+    """
+    Array view of a pose report's frames, built once per video and shared
+    by the bowling helpers. Metric columns are NaN where a frame has no value.
+    """
+    landmarks: np.ndarray    # (N, 33, 3) x, y, z
+    visibility: np.ndarray   # (N, 33) MediaPipe visibility, 0 without a pose
+    mask: np.ndarray         # (N,) frames with a full pose
+    right_elbow: np.ndarray  # (N,) degrees
+    left_elbow: np.ndarray
+    right_knee: np.ndarray
+    left_knee: np.ndarray
+
+    @classmethod
+    def from_pose_arrays(cls, pose: PoseArrays) -> "FrameTensors":
+        return cls(
+            landmarks=pose.landmarks,
+            visibility=pose.visibility,
+            mask=pose.mask,
+            right_elbow=pose.metric("right_elbow_angle"),
+            left_elbow=pose.metric("left_elbow_angle"),
+            right_knee=pose.metric("right_knee_angle"),
+            left_knee=pose.metric("left_knee_angle"),
+        )
+
+    @classmethod
+    def from_frames(cls, frames: List[Dict]) -> "FrameTensors":
+        """Build from legacy per-frame dicts via the PoseArrays shim"""
+        return cls.from_pose_arrays(PoseArrays.from_frames(frames))
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+    def visible(self, joint_indices: np.ndarray, threshold: float = _MIN_VISIBILITY) -> np.ndarray:
+        """(N,) mask of frames where every given joint is seen above threshold"""
+        return self.mask & (self.visibility[:, joint_indices].min(axis=1) > threshold)
+
+
+@dataclass
+class BowlingMetrics:
+    """
+    Metrics for one analyzed delivery. Attributes default to the values
+    the report falls back to when a metric could not be measured.
+    """
+    bowling_arm: str = "right"
+    bowling_style: str = ""
+    elbow_extension: float = 0.0
+    max_elbow_angle: Optional[float] = None
+    min_elbow_angle: Optional[float] = None
+    release_point: dict = field(default_factory=dict)
+    release_frame: Optional[int] = None
+    front_foot_landing: dict = field(default_factory=dict)
+    swing_type: str = ""
+    swing_angle: float = 0.0
+    estimated_speed: float = 0.0  # pose alone cannot give speed; ball tracking supplies speed_kmh
+    speed_kmh: float = 0.0
+    spin_rpm: float = 0.0
+    is_yorker: bool = False
+    is_bouncer: bool = False
+    is_full_toss: bool = False
+    accuracy_score: float = 0.0
+    performance_score: float = 0.0
+
+    @property
+    def is_no_ball(self) -> bool:
+        return self.front_foot_landing.get("is_no_ball", False)
+
 
 class BowlingAnalyzer:
-    def __init__(self, ball_model_path="models/cricket_ball_detector.pt"):
-        self.pose_detector = PoseDetector()
-        self.ball_detector = AdvancedBallDetector(model_path=ball_model_path)  # NEW
+    def __init__(self, ball_model_path="models/cricket_ball_detector.pt",
+                 pose_detector: Optional[PoseDetector] = None):
+        self.pose_detector = pose_detector or _shared_pose_detector
+        self.ball_detector = get_ball_detector(ball_model_path)  # NEW
         
         # ICC Regulations
         self.ICC_ELBOW_EXTENSION_LIMIT = 15  # degrees (Law 21.3)
@@ -34,87 +165,17 @@ class BowlingAnalyzer:
             "reverse_swing": {"condition": "old_ball", "speed": "high"}
         }
     
-    def analyze_bowling_action(self, video_path: str, player_info: Dict = None, session_id: int = None) -> Dict:
-        """
-        Complete bowling action analysis with ICC compliance checks
-        """
-        print(f"🔍 Analyzing bowling video: {video_path}")
-        
-        # Step 1: Pose Detection
-        pose_data = self.pose_detector.process_video(video_path)
-        
-        if not pose_data or "frames" not in pose_data:
-            return {"error": "No pose data extracted"}
-        
-        frames = pose_data["frames"]
-        
-        # Step 2: Detect Bowling Arm
-        bowling_arm = self.detect_bowling_arm(frames)
-        print(f"   Detected bowling arm: {bowling_arm}")
-        
-        # Step 3: Extract Key Metrics
-        metrics = self.extract_bowling_metrics(frames, bowling_arm)
-        
-        # Step 4: Detect Swing Type
-        swing_type = self.detect_swing_type(frames, bowling_arm)
-        metrics["swing_type"] = swing_type
-        
-        # Step 5: ICC Compliance Check
-        violations = self.check_icc_compliance(metrics, bowling_arm)
-        
-        # Step 6: Generate Coaching Recommendations
-        recommendations = self.generate_coaching_recommendations(metrics, violations)
-        
-        # Step 7: Classify Bowling Style
-        bowling_style = self.classify_bowling_style(metrics, bowling_arm)
-        
-        # Prepare final report
-        report = {
-            "player_info": player_info,
-            "bowling_metrics": {
-                "bowling_arm": bowling_arm,
-                "bowling_style": bowling_style,
-                "elbow_extension": round(metrics.get("elbow_extension", 0), 2),
-                "release_point": metrics.get("release_point", {}),
-                "front_foot_landing": metrics.get("front_foot_landing", {}),
-                "swing_type": swing_type,
-                "average_speed_kmh": metrics.get("estimated_speed", 0),
-                "accuracy_score": metrics.get("accuracy_score", 0),
-            },
-            "icc_compliance": {
-                "is_compliant": len(violations) == 0,
-                "violations": violations,
-                "elbow_extension_status": "Legal" if metrics.get("elbow_extension", 0) <= self.ICC_ELBOW_EXTENSION_LIMIT else "Illegal",
-                "front_foot_status": "Legal" if not metrics.get("front_foot_landing", {}).get("is_no_ball", False) else "No-ball"
-            },
-            "coaching_recommendations": recommendations,
-            "pose_data_summary": {
-                "total_frames": len(frames),
-                "frames_with_pose": sum(1 for f in frames if f.get("landmarks")),
-                "key_events": self.detect_key_events(frames, bowling_arm)
-            }
-        }
-        # After computing all metrics, save to DB if session_id provided
-        if session_id:
-            self._save_delivery_to_db(session_id, ball_trajectory, ball_speed, ball_spin, metrics)
-        return report
-    
-    def detect_bowling_arm(self, frames: List[Dict]) -> str:
+    def detect_bowling_arm(self, ft: FrameTensors) -> str:
         """
         Detect which arm is used for bowling (right/left)
         """
-        right_arm_angles = []
-        left_arm_angles = []
-        
-        for frame in frames:
-            if "metrics" in frame:
-                right_arm_angles.append(frame["metrics"].get("right_elbow_angle", 0))
-                left_arm_angles.append(frame["metrics"].get("left_elbow_angle", 0))
+        # Right/left elbow angles side by side, frames with both measured
+        arm_angles = np.column_stack((ft.right_elbow, ft.left_elbow))
+        arm_angles = arm_angles[np.isfinite(arm_angles).all(axis=1)]
         
         # Compare arm movement ranges
-        if right_arm_angles and left_arm_angles:
-            right_range = max(right_arm_angles) - min(right_arm_angles)
-            left_range = max(left_arm_angles) - min(left_arm_angles)
+        if len(arm_angles):
+            right_range, left_range = np.ptp(arm_angles, axis=0)
             
             # The arm with larger movement range is likely the bowling arm
             if right_range > left_range * 1.5:
@@ -125,82 +186,55 @@ class BowlingAnalyzer:
         # Default to right arm (most common)
         return "right"
     
-    def extract_bowling_metrics(self, frames: List[Dict], bowling_arm: str) -> Dict:
+    def extract_bowling_metrics(self, ft: FrameTensors, bowling_arm: str) -> BowlingMetrics:
         """
         Extract detailed bowling metrics
         """
-        metrics = {}
-        
-        # Get arm-specific landmarks
-        if bowling_arm == "right":
-            shoulder_idx, elbow_idx, wrist_idx = 12, 14, 16  # MediaPipe indices
-            hip_idx, knee_idx, ankle_idx = 24, 26, 28  # Right leg
-        else:
-            shoulder_idx, elbow_idx, wrist_idx = 11, 13, 15  # Left arm
-            hip_idx, knee_idx, ankle_idx = 23, 25, 27  # Left leg
-        
-        # Collect data across frames
-        elbow_angles = []
-        release_points = []
-        front_foot_positions = []
-        
-        for i, frame in enumerate(frames):
-            landmarks = frame.get("landmarks", [])
-            if len(landmarks) > max(shoulder_idx, elbow_idx, wrist_idx, hip_idx, knee_idx, ankle_idx):
-                # Elbow angle
-                shoulder = landmarks[shoulder_idx]
-                elbow = landmarks[elbow_idx]
-                wrist = landmarks[wrist_idx]
-                
-                angle = self.calculate_angle(shoulder, elbow, wrist)
-                elbow_angles.append((i, angle))
-                
-                # Release point detection (minimum elbow angle)
-                if angle < 30:  # Approximate release angle
-                    release_points.append({
-                        "frame": i,
-                        "position": {"x": wrist["x"], "y": wrist["y"], "z": wrist["z"]},
-                        "angle": angle
-                    })
-                
-                # Front foot landing (simplified)
-                if i > len(frames) * 0.6:  # Later in action
-                    ankle = landmarks[ankle_idx]
-                    front_foot_positions.append({
-                        "frame": i,
-                        "y_position": ankle["y"],  # Vertical position
-                        "x_position": ankle["x"]   # Horizontal position
-                    })
-        
-        # Calculate metrics
-        if elbow_angles:
-            angles = [a[1] for a in elbow_angles]
-            metrics["elbow_extension"] = max(angles) - min(angles)
-            metrics["max_elbow_angle"] = max(angles)
-            metrics["min_elbow_angle"] = min(angles)
-        
-        # Find optimal release point
-        if release_points:
-            # Use the point with minimum elbow angle as release
-            best_release = min(release_points, key=lambda x: x["angle"])
-            metrics["release_point"] = best_release["position"]
-            metrics["release_frame"] = best_release["frame"]
-        
-        # Analyze front foot landing
-        if front_foot_positions:
-            # Find when foot is at lowest point (landing)
-            landing = min(front_foot_positions, key=lambda x: x["y_position"])
-            metrics["front_foot_landing"] = {
-                "frame": landing["frame"],
-                "position": landing,
-                "is_no_ball": landing["x_position"] > 0.95  # Simplified - would need calibration
-            }
-        
-        # Estimate bowling speed (simplified - requires calibration)
-        metrics["estimated_speed"] = self.estimate_bowling_speed(frames, bowling_arm)
+        metrics = BowlingMetrics(bowling_arm=bowling_arm)
+        
+        # Gather the arm/leg joints for the bowling side in one go: (N, 6, 3)
+        idx = _R_INDICES if bowling_arm == "right" else _L_INDICES
+        points = ft.landmarks[:, idx]
+        shoulder, elbow, wrist, hip, knee, ankle = (points[:, j] for j in range(len(idx)))
+        # Low-visibility frames give garbage joints that skew min/max extension
+        valid = ft.visible(idx)
+        
+        if valid.any():
+            # Elbow angle for all frames at once; reductions only over frames with a pose
+            angles = _vectorized_angle(shoulder[:, :2], elbow[:, :2], wrist[:, :2])
+            max_angle = float(angles[valid].max())
+            min_angle = float(angles[valid].min())
+            metrics.elbow_extension = max_angle - min_angle
+            metrics.max_elbow_angle = max_angle
+            metrics.min_elbow_angle = min_angle
+            
+            # Release point detection (minimum elbow angle below approximate release angle)
+            release = valid & (angles < 30)
+            if release.any():
+                release_idx = int(np.argmin(np.where(release, angles, np.inf)))
+                release_wrist = wrist[release_idx]
+                metrics.release_point = {
+                    "x": float(release_wrist[0]), "y": float(release_wrist[1]), "z": float(release_wrist[2])
+                }
+                metrics.release_frame = release_idx
+            
+            # Front foot landing (simplified): lowest ankle later in the action
+            late = valid & (np.arange(len(ft)) > len(ft) * 0.6)
+            if late.any():
+                landing_idx = int(np.argmin(np.where(late, ankle[:, 1], np.inf)))
+                landing = {
+                    "frame": landing_idx,
+                    "y_position": float(ankle[landing_idx, 1]),  # Vertical position
+                    "x_position": float(ankle[landing_idx, 0])   # Horizontal position
+                }
+                metrics.front_foot_landing = {
+                    "frame": landing_idx,
+                    "position": landing,
+                    "is_no_ball": landing["x_position"] > 0.95  # Simplified - would need calibration
+                }
         
         # Calculate accuracy score
-        metrics["accuracy_score"] = self.calculate_accuracy_score(frames, bowling_arm)
+        metrics.accuracy_score = self.calculate_accuracy_score(ft, bowling_arm)
         
         return metrics
     
@@ -208,58 +242,34 @@ class BowlingAnalyzer:
         """
         Calculate angle between three points (point2 is vertex)
         """
-        import math
-        
-        # Convert to vectors
-        v1 = np.array([point1["x"] - point2["x"], point1["y"] - point2["y"]])
-        v2 = np.array([point3["x"] - point2["x"], point3["y"] - point2["y"]])
-        
-        # Calculate angle
-        dot_product = np.dot(v1, v2)
-        norm_product = np.linalg.norm(v1) * np.linalg.norm(v2)
-        
-        if norm_product == 0:
-            return 0
-        
-        cos_angle = dot_product / norm_product
-        cos_angle = np.clip(cos_angle, -1.0, 1.0)
-        angle = math.degrees(math.acos(cos_angle))
-        
-        return angle
+        a, b, c = (np.array([[p["x"], p["y"]]], dtype=np.float32) for p in (point1, point2, point3))
+        return float(_vectorized_angle(a, b, c)[0])
     
-    def detect_swing_type(self, frames: List[Dict], bowling_arm: str, ball_trajectory=None) -> str:
+    def detect_swing_type(self, ft: FrameTensors, bowling_arm: str, ball_trajectory=None) -> str:
         """
         Detect swing type based on arm action and ball trajectory
         """
         # If ball trajectory is available and shows lateral movement
-        if ball_trajectory and "points_2d" in ball_trajectory and len(ball_trajectory["points_2d"]) > 10:
-            points = ball_trajectory["points_2d"]
+        xy = _trajectory_xy(ball_trajectory) if ball_trajectory else None
+        if xy is not None and len(xy) > 10:
             # Compute lateral deviation (simplified)
-            start_x = points[0]["x"]
-            end_x = points[-1]["x"]
-            delta = end_x - start_x
+            delta = float(xy[-1, 0] - xy[0, 0])
             if abs(delta) > 0.1:  # threshold depends on scale
                 return "in_swing" if (bowling_arm == "right" and delta < 0) or (bowling_arm == "left" and delta > 0) else "out_swing"
         
         # Fallback to pose-based detection (as before)
-        if len(frames) < 10:
+        if len(ft) < 10:
             return "unknown"
         
-        # Get release frame metrics
-        release_frame = None
-        for frame in frames:
-            if frame.get("metrics", {}).get("right_elbow_angle", 180) < 40:
-                release_frame = frame
-                break
-        
-        if not release_frame:
+        # Get release frame (first frame with a bent bowling elbow)
+        bent = ft.right_elbow < 40
+        release_idx = int(np.argmax(bent))
+        if not bent[release_idx]:
             return "straight"
         
-        landmarks = release_frame.get("landmarks", [])
-        if len(landmarks) > 12:
-            left_shoulder = landmarks[11]
-            right_shoulder = landmarks[12]
-            shoulder_tilt = right_shoulder["y"] - left_shoulder["y"]
+        if ft.mask[release_idx]:
+            # Right shoulder (12) minus left shoulder (11) height
+            shoulder_tilt = float(ft.landmarks[release_idx, 12, 1] - ft.landmarks[release_idx, 11, 1])
             
             if shoulder_tilt > 0.05:
                 return "out_swing" if bowling_arm == "right" else "in_swing"
@@ -268,14 +278,14 @@ class BowlingAnalyzer:
         
         return "straight"
     
-    def check_icc_compliance(self, metrics: Dict, bowling_arm: str) -> List[str]:
+    def check_icc_compliance(self, metrics: BowlingMetrics, bowling_arm: str) -> List[str]:
         """
         Check ICC bowling regulations
         """
         violations = []
         
         # 1. Elbow Extension Check (Law 21.3)
-        elbow_extension = metrics.get("elbow_extension", 0)
+        elbow_extension = metrics.elbow_extension
         if elbow_extension > self.ICC_ELBOW_EXTENSION_LIMIT:
             violations.append({
                 "rule": "Law 21.3 - Illegal Bowling Action",
@@ -290,8 +300,7 @@ class BowlingAnalyzer:
             })
         
         # 2. Front Foot Landing Check (Law 24.5)
-        front_foot = metrics.get("front_foot_landing", {})
-        if front_foot.get("is_no_ball", False):
+        if metrics.is_no_ball:
             violations.append({
                 "rule": "Law 24.5 - No Ball",
                 "detail": "Front foot landing beyond popping crease",
@@ -303,14 +312,14 @@ class BowlingAnalyzer:
         
         return violations
     
-    def generate_coaching_recommendations(self, metrics: Dict, violations: List[Dict]) -> List[str]:
+    def generate_coaching_recommendations(self, metrics: BowlingMetrics, violations: List[Dict]) -> List[str]:
         """
         Generate actionable coaching recommendations
         """
         recommendations = []
         
         # Elbow extension recommendations
-        elbow_ext = metrics.get("elbow_extension", 0)
+        elbow_ext = metrics.elbow_extension
         if elbow_ext > 12:
             recommendations.append("⚠️ Work on maintaining a straighter arm through delivery")
             recommendations.append("💡 Practice with a brace to limit elbow flexion")
@@ -318,13 +327,12 @@ class BowlingAnalyzer:
             recommendations.append("✅ Excellent elbow extension - within legal limits")
         
         # Front foot landing
-        front_foot = metrics.get("front_foot_landing", {})
-        if front_foot.get("is_no_ball", False):
+        if metrics.is_no_ball:
             recommendations.append("🚫 Front foot landing needs adjustment to avoid no-balls")
             recommendations.append("💡 Practice landing with toe behind the crease line")
         
         # Swing type recommendations
-        swing_type = metrics.get("swing_type", "")
+        swing_type = metrics.swing_type
         if swing_type == "in_swing":
             recommendations.append("🔄 In-swing detected - maintain upright seam position")
         elif swing_type == "out_swing":
@@ -335,7 +343,7 @@ class BowlingAnalyzer:
             recommendations.append("🎯 Action is ICC compliant - focus on consistency")
         
         # Add speed recommendations if available
-        speed = metrics.get("estimated_speed", 0)
+        speed = metrics.estimated_speed
         if speed > 0:
             if speed < 120:
                 recommendations.append("⚡ Work on generating more pace through hip drive")
@@ -344,12 +352,11 @@ class BowlingAnalyzer:
         
         return recommendations
     
-    def classify_bowling_style(self, metrics: Dict, bowling_arm: str) -> str:
+    def classify_bowling_style(self, metrics: BowlingMetrics, bowling_arm: str) -> str:
         """
         Classify bowling style (fast, medium, spin)
         """
-        speed = metrics.get("estimated_speed", 0)
-        elbow_ext = metrics.get("elbow_extension", 0)
+        speed = metrics.estimated_speed
         
         if speed > 130:  # km/h
             style = "fast"
@@ -360,7 +367,7 @@ class BowlingAnalyzer:
         
         return f"{bowling_arm}_arm_{style}"
     
-    def calculate_accuracy_score(self, frames: List[Dict], bowling_arm: str) -> float:
+    def calculate_accuracy_score(self, ft: FrameTensors, bowling_arm: str) -> float:
         """
         Calculate bowling accuracy score (0-100)
         """
@@ -371,143 +378,142 @@ class BowlingAnalyzer:
         score = 75.0
         
         # Adjust based on consistency of release points
-        release_points = []
-        for frame in frames:
-            if frame.get("metrics", {}).get("right_elbow_angle", 180) < 40:
-                landmarks = frame.get("landmarks", [])
-                if landmarks:
-                    wrist_idx = 16 if bowling_arm == "right" else 15
-                    if len(landmarks) > wrist_idx:
-                        release_points.append(landmarks[wrist_idx])
-        
-        if len(release_points) > 2:
+        wrist_idx = (_R_INDICES if bowling_arm == "right" else _L_INDICES)[_WRIST]
+        release_idx, x_std, y_std = release_consistency(
+            ft.right_elbow, ft.landmarks[:, wrist_idx], ft.mask, 40.0
+        )
+        
+        if len(release_idx) > 2:
             # Calculate consistency of release points
-            x_positions = [p["x"] for p in release_points]
-            y_positions = [p["y"] for p in release_points]
-            
-            x_std = np.std(x_positions)
-            y_std = np.std(y_positions)
-            
             consistency = 100 * (1 - (x_std + y_std) / 2)
             score = max(0, min(100, consistency))
         
         return round(score, 1)
     
-    def detect_key_events(self, frames: List[Dict], bowling_arm: str) -> List[Dict]:
+    def detect_key_events(self, ft: FrameTensors, bowling_arm: str) -> List[Dict]:
         """
         Detect key events in bowling action
         """
-        events = []
-        
-        for i, frame in enumerate(frames):
-            metrics = frame.get("metrics", {})
-            
-            # Detect back foot contact
-            if i < len(frames) * 0.3 and metrics.get("right_knee_angle", 180) < 100:
-                events.append({"frame": i, "event": "back_foot_contact", "description": "Back foot lands"})
-            
-            # Detect front foot landing
-            if i > len(frames) * 0.6 and metrics.get("left_knee_angle", 180) < 120:
-                events.append({"frame": i, "event": "front_foot_landing", "description": "Front foot lands"})
-            
-            # Detect ball release (minimum elbow angle)
-            elbow_key = "right_elbow_angle" if bowling_arm == "right" else "left_elbow_angle"
-            if metrics.get(elbow_key, 180) < 35:
-                events.append({"frame": i, "event": "ball_release", "description": "Ball released"})
-        
+        elbow = ft.right_elbow if bowling_arm == "right" else ft.left_elbow
+        frame_idx = np.arange(len(ft))
+        
+        triples = (
+            # Back foot contact: bent back knee early in the action
+            (np.flatnonzero((frame_idx < len(ft) * 0.3) & (ft.right_knee < 100)), "back_foot_contact", "Back foot lands"),
+            # Front foot landing: bent front knee late in the action
+            (np.flatnonzero((frame_idx > len(ft) * 0.6) & (ft.left_knee < 120)), "front_foot_landing", "Front foot lands"),
+            # Ball release (minimum elbow angle)
+            (np.flatnonzero(elbow < 35), "ball_release", "Ball released"),
+        )
+        events = [{"frame": int(i), "event": ev, "description": d} for arr, ev, d in triples for i in arr]
+        
+        # Keep events in frame order (stable, so same-frame events keep the order above)
+        events.sort(key=lambda event: event["frame"])
         return events
     
-    def analyze_bowling_action(self, video_path: str, player_info: Dict = None, session_id: int = None) -> Dict:
+    def analyze_bowling_action(self, video_path: str, player_info: Dict = None, session_id: int = None,
+                               pose_report: Optional[Dict] = None) -> Dict:
         """
         Complete bowling action analysis with ICC compliance checks and ball tracking
+        Pass pose_report (from PoseDetector) to reuse pose data already computed for this video.
         """
         print(f"🔍 Analyzing bowling video: {video_path}")
         
-        # Step 1: Pose Detection
-        pose_data = self.pose_detector.process_video(video_path)
+        if pose_report is None:
+            # Steps 1-2: Pose Detection and Ball Tracking from a single decode of the video
+            print("   Detecting pose and tracking ball...")
+            pipeline = FramePipeline(video_path)
+            with self.pose_detector.video_consumer() as process_pose:
+                pose_frames, ball_frames = pipeline.run(
+                    [process_pose, self.ball_detector.process_frame], parallel=True
+                )
+            pose_data = self.pose_detector.create_report(pose_frames, pipeline.fps, pipeline.frame_count)
+            ball_detections = [det for frame_dets in ball_frames for det in frame_dets]
+            del ball_frames
+        else:
+            # Step 2 only: pose data was supplied by the caller; frames go through the model in batches
+            print("   Tracking ball...")
+            ball_detections = self.ball_detector.detect_ball_in_video(video_path)
+            pose_data = pose_report
         
         if not pose_data or "frames" not in pose_data:
             return {"error": "No pose data extracted"}
         
         frames = pose_data["frames"]
+        ft = FrameTensors.from_frames(frames)
         
-        # Step 2: Ball Tracking
-        print("   Tracking ball...")
-        ball_detections = self.ball_detector.detect_ball_in_video(video_path)
-        ball_trajectory = self.ball_detector.track_ball_trajectory(video_path)
+        ball_trajectory = self.ball_detector.trajectory_from_detections(ball_detections)
         
         # Calculate ball metrics
-        ball_speed = self.ball_detector.calculate_ball_speed(ball_trajectory)
+        # None without a usable trajectory; the bowling metrics and score treat that as 0
+        ball_speed = self.ball_detector.calculate_ball_speed(ball_trajectory) or 0.0
         ball_spin = self.ball_detector.calculate_spin_rate(ball_detections)
+        # Only the count is reported; drop the per-frame detections now to lower peak memory
+        detections_count = len(ball_detections)
+        del ball_detections
         ball_type = self.classify_ball_type(ball_trajectory, ball_speed)
         
         # Step 3: Detect Bowling Arm
-        bowling_arm = self.detect_bowling_arm(frames)
+        bowling_arm = self.detect_bowling_arm(ft)
         print(f"   Detected bowling arm: {bowling_arm}")
         
         # Step 4: Extract Key Metrics (pose-based)
-        metrics = self.extract_bowling_metrics(frames, bowling_arm)
+        metrics = self.extract_bowling_metrics(ft, bowling_arm)
         
         # Add ball tracking metrics
-        metrics["speed_kmh"] = ball_speed
-        metrics["spin_rpm"] = ball_spin
-        metrics.update(ball_type)
+        metrics.speed_kmh = ball_speed
+        metrics.spin_rpm = ball_spin
+        for ball_type_key, is_type in ball_type.items():
+            setattr(metrics, ball_type_key, is_type)
         
         # Step 5: Detect Swing Type (combine pose and ball data)
-        swing_type = self.detect_swing_type(frames, bowling_arm, ball_trajectory)
-        metrics["swing_type"] = swing_type
+        metrics.swing_type = self.detect_swing_type(ft, bowling_arm, ball_trajectory)
+        
+        # Nothing below needs the per-point trajectory dicts
+        ball_trajectory = _compact_trajectory(ball_trajectory)
         
         # Step 6: ICC Compliance Check
         violations = self.check_icc_compliance(metrics, bowling_arm)
         
         # Step 7: Calculate Performance Score
-        performance_score = self.calculate_performance_score(metrics)
-        metrics["performance_score"] = performance_score
+        metrics.performance_score = self.calculate_performance_score(metrics)
         
         # Step 8: Generate Coaching Recommendations
         recommendations = self.generate_coaching_recommendations(metrics, violations)
         
         # Step 9: Classify Bowling Style
-        bowling_style = self.classify_bowling_style(metrics, bowling_arm)
+        metrics.bowling_style = self.classify_bowling_style(metrics, bowling_arm)
         
         # Prepare final report
         report = {
             "player_info": player_info,
-            "bowling_metrics": {
-                "bowling_arm": bowling_arm,
-                "bowling_style": bowling_style,
-                "elbow_extension": round(metrics.get("elbow_extension", 0), 2),
-                "release_point": metrics.get("release_point", {}),
-                "front_foot_landing": metrics.get("front_foot_landing", {}),
-                "swing_type": swing_type,
-                "speed_kmh": ball_speed,
-                "spin_rpm": ball_spin,
-                "is_yorker": metrics.get("is_yorker", False),
-                "is_bouncer": metrics.get("is_bouncer", False),
-                "is_full_toss": metrics.get("is_full_toss", False),
-                "accuracy_score": metrics.get("accuracy_score", 0),
-                "performance_score": performance_score,
-            },
+            "bowling_metrics": {**asdict(metrics), "elbow_extension": round(metrics.elbow_extension, 2)},
             "icc_compliance": {
                 "is_compliant": len(violations) == 0,
                 "violations": violations,
-                "elbow_extension_status": "Legal" if metrics.get("elbow_extension", 0) <= self.ICC_ELBOW_EXTENSION_LIMIT else "Illegal",
-                "front_foot_status": "Legal" if not metrics.get("front_foot_landing", {}).get("is_no_ball", False) else "No-ball"
+                "elbow_extension_status": "Legal" if metrics.elbow_extension <= self.ICC_ELBOW_EXTENSION_LIMIT else "Illegal",
+                "front_foot_status": "Legal" if not metrics.is_no_ball else "No-ball"
             },
             "coaching_recommendations": recommendations,
             "pose_data_summary": {
                 "total_frames": len(frames),
-                "frames_with_pose": sum(1 for f in frames if f.get("landmarks")),
-                "key_events": self.detect_key_events(frames, bowling_arm)
+                "frames_with_pose": int(ft.mask.sum()),
+                "key_events": self.detect_key_events(ft, bowling_arm)
             },
             "ball_tracking": {
-                "detections_count": len(ball_detections),
+                "detections_count": detections_count,
                 "trajectory_summary": ball_trajectory.get("summary", {}),
                 "average_speed": ball_speed,
                 "max_speed": ball_speed,  # could compute from trajectory
             }
         }
         
+        # After computing all metrics, save to DB if session_id provided
+        if session_id:
+            from app.database import SessionLocal
+            
+            with SessionLocal() as db:
+                self._save_delivery_to_db(session_id, ball_trajectory, ball_speed, ball_spin, metrics, db=db)
         return report
     
     def classify_ball_type(self, trajectory, speed):
@@ -516,31 +522,26 @@ class BowlingAnalyzer:
         if not trajectory or "points_2d" not in trajectory:
             return result
         
-        points = trajectory.get("points_2d", [])
+        points = _trajectory_xy(trajectory)
         if len(points) < 10:
             return result
         
-        # Find minimum y (height) after release
-        heights = [p["y"] for p in points[5:]]  # skip first few frames
-        if not heights:
-            return result
-        min_height = min(heights)
+        # Find minimum y (height) after release, skipping the first few frames
+        min_height = points[5:, 1].min()
         
-        # Rough classification (assuming normalized coordinates, y=1 top, y=0 bottom)
+        # Rough classification (assuming normalized coordinates, y=1 top, y=0 bottom):
+        # < 0.2 yorker, 0.2-0.4 none, 0.4-0.8 full toss, >= 0.8 bouncer
         # Adjust thresholds based on your camera setup
-        if min_height < 0.2:
-            result["is_yorker"] = True
-        elif min_height > 0.8:
-            result["is_bouncer"] = True
-        elif min_height > 0.4:
-            result["is_full_toss"] = True
+        ball_type = _BALL_TYPE_BY_HEIGHT[int(np.digitize(min_height, _HEIGHT_BINS))]
+        if ball_type:
+            result[ball_type] = True
         return result
     
-    def calculate_performance_score(self, metrics):
+    def calculate_performance_score(self, metrics: BowlingMetrics):
         """Overall performance score (0-100) combining speed, accuracy, spin"""
-        speed = metrics.get("speed_kmh", 0)
-        accuracy = metrics.get("accuracy_score", 50)
-        spin = metrics.get("spin_rpm", 0)
+        speed = metrics.speed_kmh
+        accuracy = metrics.accuracy_score
+        spin = metrics.spin_rpm
         
         # Normalize speed: 150 km/h = 100 points
         speed_score = min(speed / 150 * 40, 40)
@@ -550,9 +551,9 @@ class BowlingAnalyzer:
         total = speed_score + accuracy_score + spin_score
         return round(min(total, 100), 1)
 
-    def _save_delivery_to_db(self, session_id: int, ball_trajectory: dict, ball_speed: float, ball_spin: float, metrics: dict):
+    def _delivery_row(self, ball_trajectory: dict, ball_speed: float, ball_spin: float, metrics: BowlingMetrics) -> dict:
         """
-        Save the analyzed delivery to the database.
+        Build the Delivery column values for one analyzed delivery.
         """
         # Get pitch landing point from ball_trajectory
         pitch_point = ball_trajectory.get("pitch_landing")
@@ -578,41 +579,51 @@ class BowlingAnalyzer:
                     runs = 4
 
         # Get release point from pose metrics
-        release = metrics.get("release_point", {})
-        elbow_ext = metrics.get("elbow_extension")
+        release = metrics.release_point
+        elbow_ext = metrics.elbow_extension
+
+        return dict(
+            speed_kmh=ball_speed,
+            spin_rpm=ball_spin,
+            swing_angle=metrics.swing_angle,
+            pitch_landing_x=pitch_point["x"] if pitch_point else None,
+            pitch_landing_y=pitch_point["y"] if pitch_point else None,
+            line=line,
+            length=length,
+            is_boundary=is_boundary,
+            boundary_type=boundary_type,
+            runs=runs,
+            elbow_extension=elbow_ext,
+            release_point_x=release.get("x"),
+            release_point_y=release.get("y"),
+            release_point_z=release.get("z"),
+        )
+
+    def _save_delivery_to_db(self, session_id: int, ball_trajectory: dict, ball_speed: float, ball_spin: float,
+                             metrics: BowlingMetrics, db: Optional["Session"] = None):
+        """
+        Save the analyzed delivery to the database.
+        Pass db to reuse the caller's session; otherwise one is opened and closed here.
+        """
+        from sqlalchemy import func, insert, select
+        from app.core.models import Delivery
+        from app.database import SessionLocal
+
+        row = self._delivery_row(ball_trajectory, ball_speed, ball_spin, metrics)
 
-        # Auto-increment delivery_number
-        db = SessionLocal()
+        # Auto-increment delivery_number inside the INSERT itself (one round-trip)
+        next_number = (
+            select(func.coalesce(func.max(Delivery.delivery_number), 0) + 1)
+            .where(Delivery.session_id == session_id)
+            .scalar_subquery()
+        )
+
+        owns_db = db is None
+        if owns_db:
+            db = SessionLocal()
         try:
-            # Get current max delivery number for this session
-            max_num = db.query(func.max(Delivery.delivery_number)).filter(Delivery.session_id == session_id).scalar()
-            delivery_number = (max_num or 0) + 1
-
-            delivery = Delivery(
-                session_id=session_id,
-                delivery_number=delivery_number,
-                speed_kmh=ball_speed,
-                spin_rpm=ball_spin,
-                swing_angle=metrics.get("swing_angle", 0),
-                pitch_landing_x=pitch_point["x"] if pitch_point else None,
-                pitch_landing_y=pitch_point["y"] if pitch_point else None,
-                line=line,
-                length=length,
-                is_boundary=is_boundary,
-                boundary_type=boundary_type,
-                runs=runs,
-                elbow_extension=elbow_ext,
-                release_point_x=release.get("x"),
-                release_point_y=release.get("y"),
-                release_point_z=release.get("z"),
-            )
-            db.add(delivery)
+            db.execute(insert(Delivery).values(session_id=session_id, delivery_number=next_number, **row))
             db.commit()
         finally:
-            db.close()
-
-    
-    # For estimate_bowling_speed, you could replace it with:
-    def estimate_bowling_speed(self, frames, bowling_arm):
-        # This method is now superseded by ball tracking; return 0 or use ball tracker
-        return 0.0
\ No newline at end of file
+            if owns_db:
+                db.close()
@@ -0,0 +1,352 @@
+"""
+Shared video decode loop: read each frame once and hand it to several
+per-frame consumers (pose detector, ball detector, ...)
+"""
+import os
+import cv2
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Any, Tuple
+
+import numpy as np
+
+try:
+    from tqdm import tqdm
+    TQDM_AVAILABLE = True
+except ImportError:
+    TQDM_AVAILABLE = False
+
+# consumer(frame_number, frame_bgr, frame_rgb, fps) -> per-frame result
+FrameConsumer = Callable[[int, np.ndarray, np.ndarray, float], Any]
+
+_EOF = None  # reader thread -> consumer end-of-video sentinel
+
+
+# Decode backend for open_video_capture: any | vaapi | d3d11 | mfx | cuda | gstreamer | none
+DECODE_BACKEND = os.getenv("VIDEO_DECODE_BACKEND", "any").lower()
+
+_ACCELERATION_TYPES = {
+    "any": "VIDEO_ACCELERATION_ANY",
+    "vaapi": "VIDEO_ACCELERATION_VAAPI",
+    "d3d11": "VIDEO_ACCELERATION_D3D11",
+    "mfx": "VIDEO_ACCELERATION_MFX",
+}
+
+
+def open_video_capture(video_path: str, hw_accel: bool = True) -> cv2.VideoCapture:
+    """
+    Open a video with FFmpeg hardware-accelerated decoding when OpenCV and
+    the machine support it (OpenCV 4.5.2+), else the default software decoder.
+    The device type comes from VIDEO_DECODE_BACKEND; "cuda" routes FFmpeg
+    through NVDEC via OPENCV_FFMPEG_CAPTURE_OPTIONS, "gstreamer" decodes
+    through a GStreamer appsink pipeline (OpenCV built with GStreamer),
+    "none" disables it.
+    hw_accel=False skips the hardware device setup for callers that only
+    read properties or a single frame.
+    The internal capture buffer is capped at one frame.
+    """
+    cap = None
+    if hw_accel and DECODE_BACKEND == "gstreamer":
+        cap = cv2.VideoCapture(_gstreamer_pipeline(video_path), cv2.CAP_GSTREAMER)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        cap = None
+    elif hw_accel and DECODE_BACKEND == "cuda":
+        # Read by OpenCV's FFmpeg backend on every open; an explicit setting wins
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "hwaccel;cuda")
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap.release()
+            cap = None
+    elif hw_accel and hasattr(cv2, _ACCELERATION_TYPES.get(DECODE_BACKEND, "")):
+        try:
+            cap = cv2.VideoCapture(
+                video_path, cv2.CAP_FFMPEG,
+                (cv2.CAP_PROP_HW_ACCELERATION, getattr(cv2, _ACCELERATION_TYPES[DECODE_BACKEND]))
+            )
+            if not cap.isOpened():
+                cap.release()
+                cap = None
+        except cv2.error:
+            cap = None
+    if cap is None:
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def _gstreamer_pipeline(video_path: str) -> str:
+    """
+    File decode pipeline ending in a one-buffer appsink. BGR output keeps
+    the same frame contract as the FFmpeg backend. Frames are not dropped,
+    since every frame of an uploaded video is analysed.
+    """
+    location = video_path.replace("\\", "\\\\").replace('"', '\\"')
+    return (
+        f'filesrc location="{location}" ! decodebin ! videoconvert ! '
+        "video/x-raw,format=BGR ! appsink sync=false max-buffers=1 drop=false"
+    )
+
+
+FRAME_BATCH_SIZE = int(os.getenv("FRAME_BATCH_SIZE", "16"))
+
+
+def iter_frame_batches(video_path: str, batch_size: int = FRAME_BATCH_SIZE, interval: int = 1,
+                       rgb: bool = True, prefetch: int = 2) -> Iterator[np.ndarray]:
+    """
+    Yield frames in (B, H, W, 3) uint8 batches, taking every `interval`th
+    frame: RGB, or BGR as decoded with rgb=False (what YOLO expects).
+    With prefetch > 0 up to that many batches are decoded ahead on a reader
+    thread while the caller works on the current one.
+    Batch buffers are allocated up front and reused, and frames are written
+    straight into them, so a yielded array is a view that is valid until the
+    next batch is taken; copy it if it must outlive the loop.
+    The last batch may be shorter than batch_size.
+    """
+    cap = open_video_capture(video_path)
+    # Queued batches + the one being consumed + the one being filled
+    ring = prefetch + 2 if prefetch > 0 else 1
+    batches = _decode_batches(cap, batch_size, interval, rgb, ring)
+    if prefetch > 0:
+        batches = _prefetch(batches, prefetch)
+    try:
+        yield from batches
+    finally:
+        batches.close()
+        cap.release()
+
+
+def _decode_batches(cap: cv2.VideoCapture, batch_size: int, interval: int, rgb: bool,
+                    ring: int) -> Iterator[np.ndarray]:
+    """Decode loop of iter_frame_batches, cycling through `ring` batch buffers"""
+    if not cap.isOpened():
+        return
+    buffers = None
+    batch = None
+    filled = 0
+    frame_idx = 0
+    while True:
+        # Skipped frames are only grabbed, never retrieved
+        if not cap.grab():
+            break
+
+        if frame_idx % interval == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            # Sized from the first decoded frame; not every backend reports it
+            if buffers is None:
+                buffers = [np.empty((batch_size,) + frame.shape, np.uint8) for _ in range(ring)]
+            if filled == 0:
+                batch = buffers[0]
+                buffers.append(buffers.pop(0))
+            if rgb:
+                # Convert BGR to RGB in place in the batch buffer
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=batch[filled])
+            else:
+                batch[filled] = frame
+            filled += 1
+            if filled == batch_size:
+                yield batch
+                filled = 0
+
+        frame_idx += 1
+
+    if filled:
+        yield batch[:filled]
+
+
+def _prefetch(items: Iterator, depth: int) -> Iterator:
+    """
+    Run an iterator on a reader thread, at most `depth` items ahead of the
+    consumer. An exception raised by the reader is re-raised to the consumer;
+    closing the returned generator stops and joins the reader.
+    """
+    queued = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Bounded put that still notices stop if the consumer side bailed out
+        while not stop.is_set():
+            try:
+                queued.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_EOF)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = queued.get()
+            if item is _EOF:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+class FramePipeline:
+    """Decode a video once and dispatch every frame to all consumers"""
+
+    def __init__(self, video_path: str, prefetch: int = 8):
+        """
+        :param prefetch: frames decoded ahead by the reader thread (0 = decode inline)
+        """
+        self.video_path = video_path
+        self.prefetch = prefetch
+        self.fps = 0.0
+        self.frame_count = 0
+        self._position = 0  # index of the next frame in the video (decoder side)
+
+    def run(self, consumers: List[FrameConsumer], parallel: bool = False) -> List[List[Any]]:
+        """
+        Run all consumers over the video.
+        Decoding and BGR->RGB conversion run in a reader thread feeding a
+        bounded queue, so codec work overlaps with inference.
+        The first consumer always runs on the calling thread. Put a stateful
+        one there, such as a VIDEO-mode MediaPipe landmarker, whose GPU
+        delegate is bound to the thread that created it.
+        With parallel=True the other consumers of each frame run in pool
+        threads alongside it (cv2/torch release the GIL), so a frame costs the
+        slowest consumer rather than the sum. Each consumer still sees frames
+        one at a time and in order.
+        Returns one list of per-frame results for each consumer, in order.
+        """
+        results = [[] for _ in consumers]
+        pool = ThreadPoolExecutor(max_workers=len(consumers) - 1) if parallel and len(consumers) > 1 else None
+
+        frames = self.frames()
+        progress = None
+        try:
+            for frame_number, frame, frame_rgb in frames:
+                if progress is None:
+                    progress = _Progress(self.frame_count)
+
+                if pool is not None:
+                    futures = [pool.submit(consumer, frame_number, frame, frame_rgb, self.fps) for consumer in consumers[1:]]
+                    results[0].append(consumers[0](frame_number, frame, frame_rgb, self.fps))
+                    for future, consumer_results in zip(futures, results[1:]):
+                        consumer_results.append(future.result())
+                else:
+                    for consumer, consumer_results in zip(consumers, results):
+                        consumer_results.append(consumer(frame_number, frame, frame_rgb, self.fps))
+
+                progress.update(frame_number + 1)
+        finally:
+            if progress is not None:
+                progress.close()
+            frames.close()
+            if pool is not None:
+                pool.shutdown()
+        return results
+
+    def frames(self) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Yield (frame_number, frame_bgr, frame_rgb) for every frame,
+        decoded ahead on the reader thread when prefetch > 0. The RGB array
+        is a reused buffer, valid until the next frame is taken.
+        fps and frame_count are set once the first frame is taken.
+        """
+        self._position = 0
+        cap = open_video_capture(self.video_path)
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+        if self.prefetch > 0:
+            # Queued frames + the one being consumed + the one being decoded
+            decoded = _prefetch(self._decoded(cap, _RGBBufferRing(self.prefetch + 2)), self.prefetch)
+        else:
+            decoded = self._decoded(cap, _RGBBufferRing(1))
+        try:
+            yield from decoded
+        finally:
+            decoded.close()
+            cap.release()
+
+    def _decoded(self, cap: cv2.VideoCapture, rgb_buffers: "_RGBBufferRing"):
+        """Decode frames until the end of the video"""
+        while True:
+            item = self._decode(cap, rgb_buffers)
+            if item is _EOF:
+                return
+            yield item
+
+    def _decode(self, cap: cv2.VideoCapture, rgb_buffers: "_RGBBufferRing"):
+        """Read the next frame; returns (frame_number, bgr, rgb) or _EOF"""
+        if not cap.isOpened():
+            return _EOF
+        success, frame = cap.read()
+        if not success:
+            return _EOF
+        frame_number = self._position
+        self._position += 1
+        # One BGR->RGB conversion shared by every consumer, into a reused buffer
+        return frame_number, frame, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_buffers.next(frame))
+
+
+class _RGBBufferRing:
+    """
+    Fixed set of RGB frame buffers handed out round-robin, so the colour
+    conversion writes into preallocated memory instead of a new array per
+    frame. size must cover every frame that can be alive at once.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._buffers: List[np.ndarray] = []
+        self._next = 0
+
+    def next(self, frame: np.ndarray) -> np.ndarray:
+        if not self._buffers or self._buffers[0].shape != frame.shape:
+            self._buffers = [np.empty_like(frame) for _ in range(self.size)]
+            self._next = 0
+        buf = self._buffers[self._next]
+        self._next = (self._next + 1) % self.size
+        return buf
+
+
+class _Progress:
+    """
+    Frame progress: a tqdm bar (self rate-limited) when tqdm is installed,
+    otherwise one line per 10% of the video instead of per-frame prints.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self._bar = tqdm(total=total or None, desc="frames", unit="frame") if TQDM_AVAILABLE else None
+        self._position = 0
+        self._next_report = max(1, total // 10)
+
+    def update(self, position: int):
+        if self._bar is not None:
+            self._bar.update(position - self._position)
+        elif position >= self._next_report:
+            print(f"Processed {position}/{self.total} frames...")
+            self._next_report += max(1, self.total // 10)
+        self._position = position
+
+    def close(self):
+        if self._bar is not None:
+            self._bar.close()
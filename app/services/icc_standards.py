@@ -3,6 +3,7 @@
 ICC and coaching standards for batting and bowling
 Based on MCC Laws of Cricket and coaching manuals
 """
+from ._bowling_kernels import VERDICT_ELBOW_ILLEGAL, VERDICT_ELBOW_WARNING, VERDICT_NO_BALL, bowling_verdict
 
 ICC_BATTING_STANDARDS = {
     "stance": {
@@ -57,22 +58,32 @@ ICC_BOWLING_STANDARDS = {
     }
 }
 
+# Flat views of the limits used by the checks below, resolved once at import
+_HEAD_Y_VARIANCE = ICC_BATTING_STANDARDS["stance"]["optimal"]["head_position"]["y_variance"]
+_STANCE_SHOULDER_RANGES = {
+    stance_type: limits["shoulder_angle"]
+    for stance_type, limits in ICC_BATTING_STANDARDS["stance"]["types"].items()
+}
+_ELBOW_LIMIT = ICC_BOWLING_STANDARDS["legal_limits"]["elbow_extension"]
+_ELBOW_WARNING = ICC_BOWLING_STANDARDS["legal_limits"]["arm_actions"]["thresholds"]["warning"]
+
 def check_batting_compliance(metrics: dict) -> dict:
     """Check batting metrics against ICC/coaching standards"""
     compliance = {"pass": True, "warnings": [], "issues": []}
     
     # Check stance
     stance_type = metrics.get("stance_type", "unknown")
-    if stance_type in ICC_BATTING_STANDARDS["stance"]["types"]:
+    shoulder_range = _STANCE_SHOULDER_RANGES.get(stance_type)
+    if shoulder_range is not None:
         shoulder_angle = metrics.get("shoulder_angle", 90)
-        min_angle, max_angle = ICC_BATTING_STANDARDS["stance"]["types"][stance_type]["shoulder_angle"]
+        min_angle, max_angle = shoulder_range
         
         if not (min_angle <= shoulder_angle <= max_angle):
             compliance["warnings"].append(f"Shoulder angle {shoulder_angle}° not optimal for {stance_type} stance")
     
     # Check head position
     head_movement = metrics.get("head_movement", 0)
-    if head_movement > ICC_BATTING_STANDARDS["stance"]["optimal"]["head_position"]["y_variance"]:
+    if head_movement > _HEAD_Y_VARIANCE:
         compliance["issues"].append(f"Excessive head movement: {head_movement:.2f}")
         compliance["pass"] = False
     
@@ -87,16 +98,22 @@ def check_bowling_compliance(metrics: dict) -> dict:
         "violations": []
     }
     
-    # Elbow extension check
     elbow_ext = metrics.get("elbow_extension", 0)
-    if elbow_ext > ICC_BOWLING_STANDARDS["legal_limits"]["elbow_extension"]:
+    verdict = bowling_verdict(
+        float(elbow_ext), bool(metrics.get("front_foot_no_ball", False)), _ELBOW_LIMIT, _ELBOW_WARNING
+    )
+    if not verdict:
+        return compliance
+    
+    # Elbow extension check
+    if verdict & VERDICT_ELBOW_ILLEGAL:
         compliance["legal"] = False
         compliance["elbow_status"] = "illegal"
         compliance["violations"].append({
             "rule": "Law 21.3",
             "detail": f"Elbow extension {elbow_ext:.1f}° exceeds 15° limit"
         })
-    elif elbow_ext > ICC_BOWLING_STANDARDS["legal_limits"]["arm_actions"]["thresholds"]["warning"]:
+    elif verdict & VERDICT_ELBOW_WARNING:
         compliance["elbow_status"] = "warning"
         compliance["violations"].append({
             "rule": "Law 21.3 (Warning)",
@@ -104,7 +121,7 @@ def check_bowling_compliance(metrics: dict) -> dict:
         })
     
     # Front foot check
-    if metrics.get("front_foot_no_ball", False):
+    if verdict & VERDICT_NO_BALL:
         compliance["legal"] = False
         compliance["front_foot_status"] = "no_ball"
         compliance["violations"].append({
@@ -112,4 +129,4 @@ def check_bowling_compliance(metrics: dict) -> dict:
             "detail": "Front foot landing beyond popping crease"
         })
     
-    return compliance
\ No newline at end of file
+    return compliance
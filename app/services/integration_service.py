@@ -9,9 +9,12 @@ from datetime import datetime
 import cv2
 import numpy as np
 
+from sqlalchemy import select, update
+
 from app.database import SessionLocal
 from app.core.models import Session, Analysis, SessionStatus
 from .pose_service import PoseDetector
+from .pose_cache import PoseCache
 from .bowling_analyzer import BowlingAnalyzer
 from .batting_analyzer import BattingAnalyzer
 from .video_processor import extract_video_metadata
@@ -21,8 +24,10 @@ class IntegrationService:
     
     def __init__(self):
         self.pose_detector = PoseDetector()
-        self.bowling_analyzer = BowlingAnalyzer()
-        self.batting_analyzer = BattingAnalyzer()
+        # One pose detector for the whole pipeline
+        self.bowling_analyzer = BowlingAnalyzer(pose_detector=self.pose_detector)
+        self.batting_analyzer = BattingAnalyzer(pose_detector=self.pose_detector)
+        self.pose_cache = PoseCache()
         
     def process_session(self, session_id: int) -> Dict[str, Any]:
         """
@@ -31,7 +36,7 @@ class IntegrationService:
         db = SessionLocal()
         try:
             # Get session from database
-            session = db.query(Session).filter(Session.id == session_id).first()
+            session = db.get(Session, session_id)
             if not session:
                 return {"error": f"Session {session_id} not found"}
             
@@ -39,85 +44,29 @@ class IntegrationService:
             session.status = SessionStatus.PROCESSING.value
             db.commit()
             
-            print(f"🚀 Starting analysis for session {session_id}: {session.session_type}")
-            
-            # Step 1: Extract video metadata
-            print("   Step 1: Extracting video metadata...")
-            video_path = session.video_path
-            if not os.path.exists(video_path):
-                raise FileNotFoundError(f"Video file not found: {video_path}")
-            
-            metadata = extract_video_metadata(video_path)
+            analysis_type, analysis_result, metadata = self._run_analysis(session)
             session.duration = metadata.get("duration")
             session.frame_count = metadata.get("frame_count")
             
-            # Step 2: Pose detection
-            print("   Step 2: Running pose detection...")
-            pose_report = self.pose_detector.process_video(video_path)
-            
-            if not pose_report or "frames" not in pose_report:
-                raise Exception("No pose data extracted from video")
-            
-            # Step 3: Run specific analysis
-            print(f"   Step 3: Running {session.session_type} analysis...")
-            if session.session_type == "bowling":
-                analysis_result = self.bowling_analyzer.analyze_video(video_path)
-                analysis_type = "bowling"
-            elif session.session_type == "batting":
-                analysis_result = self.batting_analyzer.analyze_video(video_path)
-                analysis_type = "batting"
-            else:
-                raise ValueError(f"Unknown session type: {session.session_type}")
-            
             # Step 4: Create analysis record
             print("   Step 4: Saving analysis to database...")
             
-            # Extract metrics
-            bowling_metrics = analysis_result.get("bowling_metrics", {})
-            batting_metrics = analysis_result.get("batting_metrics", {})
+            # Collect every Analysis column once and write them in a single statement
+            fields = self._analysis_fields(analysis_type, analysis_result)
             
-            # Create or update analysis
-            analysis = db.query(Analysis).filter(Analysis.session_id == session_id).first()
-            if not analysis:
-                analysis = Analysis(session_id=session_id)
+            analysis_id = db.execute(
+                select(Analysis.id).where(Analysis.session_id == session_id)
+            ).scalar()
+            if analysis_id is None:
+                analysis = Analysis(session_id=session_id, **fields)
                 db.add(analysis)
-            
-            # Update analysis fields
-            analysis.analysis_type = analysis_type
-            analysis.created_at = datetime.utcnow()
-            
-            # Set bowling metrics
-            if bowling_metrics:
-                analysis.bowling_arm = bowling_metrics.get("bowling_arm")
-                analysis.bowling_style = bowling_metrics.get("bowling_style")
-                analysis.elbow_extension = bowling_metrics.get("elbow_extension")
-                analysis.release_height = bowling_metrics.get("release_height")
-                analysis.release_speed = bowling_metrics.get("release_speed")
-                analysis.swing_type = bowling_metrics.get("swing_type")
-                analysis.accuracy_score = bowling_metrics.get("accuracy_score")
-                analysis.front_foot_landing = bowling_metrics.get("front_foot_landing")
-                analysis.icc_compliant = bowling_metrics.get("icc_compliant", True)
-                analysis.violations = bowling_metrics.get("violations", [])
-                analysis.recommendations = bowling_metrics.get("recommendations", [])
-            
-            # Set batting metrics
-            if batting_metrics:
-                analysis.stance_type = batting_metrics.get("stance_type")
-                analysis.weight_distribution = batting_metrics.get("weight_distribution")
-                analysis.bat_angle = batting_metrics.get("bat_angle")
-                analysis.head_stillness = batting_metrics.get("head_stillness")
-                analysis.shot_selection = batting_metrics.get("shot_selection")
-                analysis.recommendations = batting_metrics.get("recommendations", [])
-            
-            # Store pose data summary (not full data to avoid large DB entries)
-            analysis.pose_data = {
-                "total_frames": len(pose_report.get("frames", [])),
-                "key_events": pose_report.get("summary", {}).get("key_events", []),
-                "average_metrics": pose_report.get("summary", {}).get("average_metrics", {})
-            }
+                db.flush()
+                analysis_id = analysis.id
+            else:
+                db.execute(update(Analysis).where(Analysis.id == analysis_id).values(**fields))
             
             # Generate summary
-            analysis.summary = self.generate_summary(analysis_result)
+            summary = self.generate_summary(analysis_result)
             
             # Update session status
             session.status = SessionStatus.COMPLETED.value
@@ -130,19 +79,25 @@ class IntegrationService:
             return {
                 "success": True,
                 "session_id": session_id,
-                "analysis_id": analysis.id,
+                "analysis_id": analysis_id,
                 "status": "completed",
                 "analysis_type": analysis_type,
-                "summary": analysis.summary
+                "summary": summary
             }
             
         except Exception as e:
             print(f"❌ Error processing session {session_id}: {e}")
             
-            # Update session status to failed
-            if session:
-                session.status = SessionStatus.FAILED.value
+            # Update session status to failed; the failed transaction is
+            # discarded first and the row is not reloaded
+            db.rollback()
+            try:
+                db.execute(
+                    update(Session).where(Session.id == session_id).values(status=SessionStatus.FAILED.value)
+                )
                 db.commit()
+            except Exception as status_error:
+                print(f"❌ Could not mark session {session_id} as failed: {status_error}")
             
             return {
                 "success": False,
@@ -154,6 +109,95 @@ class IntegrationService:
         finally:
             db.close()
     
+    def _run_analysis(self, session: Session):
+        """
+        Steps 1-3 for one session: metadata, pose detection and the
+        session-type analysis. Returns (analysis_type, analysis_result, metadata).
+        """
+        print(f"🚀 Starting analysis for session {session.id}: {session.session_type}")
+        
+        # Step 1: Extract video metadata
+        print("   Step 1: Extracting video metadata...")
+        video_path = session.video_path
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+        
+        metadata = extract_video_metadata(video_path)
+        
+        # Step 2: Pose detection
+        print("   Step 2: Running pose detection...")
+        pose_report = self._get_pose_report(video_path)
+        
+        if not pose_report or "frames" not in pose_report:
+            raise Exception("No pose data extracted from video")
+        
+        # Step 3: Run specific analysis
+        print(f"   Step 3: Running {session.session_type} analysis...")
+        # Analyzers reuse the pose report instead of running pose detection again
+        if session.session_type == "bowling":
+            analysis_result = self.bowling_analyzer.analyze_bowling_action(video_path, pose_report=pose_report)
+            analysis_type = "bowling"
+        elif session.session_type == "batting":
+            analysis_result = self.batting_analyzer.analyze_video(video_path, pose_report=pose_report)
+            analysis_type = "batting"
+        else:
+            raise ValueError(f"Unknown session type: {session.session_type}")
+        
+        return analysis_type, analysis_result, metadata
+    
+    def _analysis_fields(self, analysis_type: str, analysis_result: Dict) -> Dict[str, Any]:
+        """Analysis column values for one analysis result"""
+        # Extract metrics
+        bowling_metrics = analysis_result.get("bowling_metrics", {})
+        batting_metrics = analysis_result.get("batting_metrics", {})
+        
+        fields = {
+            "analysis_type": analysis_type,
+            "created_at": datetime.utcnow(),
+        }
+        
+        # Bowling metrics
+        if bowling_metrics:
+            fields.update(
+                arm_type=bowling_metrics.get("bowling_arm"),
+                elbow_extension=bowling_metrics.get("elbow_extension"),
+                release_point=bowling_metrics.get("release_point"),
+                swing_type=bowling_metrics.get("swing_type"),
+                front_foot_landing=bowling_metrics.get("front_foot_landing"),
+                icc_compliant=analysis_result.get("icc_compliance", {}).get("is_compliant", True),
+                recommendations=analysis_result.get("coaching_recommendations", []),
+            )
+        
+        # Batting metrics
+        if batting_metrics:
+            fields.update(
+                stance_type=batting_metrics.get("stance_type"),
+                weight_distribution=batting_metrics.get("weight_distribution"),
+                bat_angle=batting_metrics.get("bat_angle"),
+                head_position=batting_metrics.get("head_position"),
+                recommendations=batting_metrics.get("recommendations", []),
+            )
+        
+        return fields
+    
+    def _get_pose_report(self, video_path: str) -> Dict:
+        """
+        Pose report for the video, served from the on-disk cache when the
+        same video was processed before with the same model
+        """
+        # Mock reports (no MediaPipe) are cheap and must not be cached
+        if not self.pose_detector.available:
+            return self.pose_detector.process_video(video_path)
+        
+        key = self.pose_cache.key(video_path, os.path.basename(self.pose_detector.model_path))
+        pose_report = self.pose_cache.get(key)
+        if pose_report is None:
+            pose_report = self.pose_detector.process_video(video_path)
+            self.pose_cache.put(key, pose_report)
+        else:
+            print("   Using cached pose data")
+        return pose_report
+    
     def generate_summary(self, analysis_result: Dict) -> str:
         """Generate a human-readable summary of the analysis"""
         
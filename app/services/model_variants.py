@@ -0,0 +1,30 @@
+"""
+Pick reduced-precision model artifacts when they have been exported next
+to the full-precision ones.
+MODEL_PRECISION=fp16|int8 selects the variant; unset keeps the original model.
+"""
+import os
+
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "").lower()
+
+# Preferred artifact formats per source format, best first
+_VARIANT_EXTENSIONS = {
+    ".pt": (".engine", ".onnx", ".pt"),  # TensorRT, ONNX Runtime, PyTorch
+}
+
+
+def resolve_model_variant(model_path: str, precision: str = MODEL_PRECISION) -> str:
+    """
+    Path of the `<stem>.<precision><ext>` artifact for model_path if one
+    exists (e.g. cricket_ball_detector.fp16.engine), else model_path itself.
+    """
+    if precision not in ("fp16", "int8"):
+        return model_path
+    stem, ext = os.path.splitext(model_path)
+    for variant_ext in _VARIANT_EXTENSIONS.get(ext, (ext,)):
+        candidate = f"{stem}.{precision}{variant_ext}"
+        if os.path.exists(candidate):
+            print(f"Using {precision} model variant: {candidate}")
+            return candidate
+    return model_path
+
@@ -0,0 +1,107 @@
+"""
+On-disk cache of pose reports keyed by video content, so re-analysing the
+same video skips pose inference. Reports are stored as compressed JSON
+(orjson + zstd when available, json + gzip otherwise).
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+    _DECOMPRESS_ERRORS = (zstandard.ZstdError,)
+except ImportError:
+    ZSTD_AVAILABLE = False
+    _DECOMPRESS_ERRORS = ()
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Bump whenever the pose report layout changes so stale entries are ignored
+POSE_SCHEMA_VERSION = 2
+
+_HASH_CHUNK = 1 << 20  # 1 MiB
+
+
+def _to_json(obj):
+    """json.dumps fallback for the NumPy values in pose reports"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(report: Dict) -> bytes:
+    if ORJSON_AVAILABLE:
+        # Serializes the landmark arrays natively, no tolist() round-trip
+        return orjson.dumps(report, option=orjson.OPT_SERIALIZE_NUMPY, default=_to_json)
+    return json.dumps(report, default=_to_json).encode()
+
+
+def _loads(data: bytes) -> Dict:
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
+class PoseCache:
+    """Pose report cache under cache_dir, one file per (video, detector) key"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv("POSE_CACHE_DIR", "var/pose_cache")
+        self._suffix = ".json.zst" if ZSTD_AVAILABLE else ".json.gz"
+
+    def key(self, video_path: str, *detector_parts: str) -> str:
+        """sha256 of the video bytes plus schema version and detector/model identifiers"""
+        digest = hashlib.sha256()
+        with open(video_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        digest.update(f"|v{POSE_SCHEMA_VERSION}|{'|'.join(detector_parts)}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached report for key, or None on a miss or unreadable entry"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                report = _loads(self._decompress(f.read()))
+        except (OSError, ValueError, *_DECOMPRESS_ERRORS) as e:
+            print(f"WARNING: Ignoring unreadable pose cache entry {path}: {e}")
+            return None
+        
+        # Landmarks are stored as nested lists; restore the (33, 4) arrays
+        for frame in report.get("frames", []):
+            frame["landmarks"] = np.asarray(frame["landmarks"], dtype=np.float32).reshape(-1, 4)
+        return report
+
+    def put(self, key: str, report: Dict):
+        """Store report for key; written to a temp file and renamed so readers never see partial data"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._compress(_dumps(report)))
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self._suffix)
+
+    def _compress(self, data: bytes) -> bytes:
+        if ZSTD_AVAILABLE:
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if ZSTD_AVAILABLE:
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
@@ -1,8 +1,14 @@
-import cv2
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-import json
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Any, List, Dict, Iterator, Tuple, Optional
 import os
+import threading
+
+from .frame_pipeline import FrameConsumer, FramePipeline
+from .model_variants import resolve_model_variant
+from ._pose_kernels import NUMBA_AVAILABLE, process_landmarks_batch
 
 # For MediaPipe 0.10.31 with Tasks API
 try:
@@ -14,39 +20,188 @@ except ImportError:
     MP_AVAILABLE = False
     print("WARNING: MediaPipe not available. Using mock implementation.")
 
+NUM_LANDMARKS = 33  # MediaPipe pose landmarks per frame
+
+# Per-frame metrics produced by _attach_frame_metrics, in PoseArrays column order
+POSE_METRIC_NAMES = ("left_elbow_angle", "right_elbow_angle", "shoulder_alignment")
+
+# Per-frame landmarks are a (33, 4) float32 array; columns and key rows:
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+NOSE = 0
+SHOULDER_L, SHOULDER_R = 11, 12
+ELBOW_L, ELBOW_R = 13, 14
+WRIST_L, WRIST_R = 15, 16
+
+# Shoulder, elbow, wrist landmark indices per arm
+_LEFT_ARM = (SHOULDER_L, ELBOW_L, WRIST_L)
+_RIGHT_ARM = (SHOULDER_R, ELBOW_R, WRIST_R)
+_LANDMARK_FIELDS = ("x", "y", "z", "visibility")
+_NO_LANDMARKS = np.zeros((0, 4), dtype=np.float32)
+_MIN_VISIBILITY = 0.5  # angles are only measured when all three joints are this visible
+_ARMS = np.array([_LEFT_ARM, _RIGHT_ARM], dtype=np.int64)
+
+# In VIDEO mode the landmarker tracks the previous frame's pose ROI and only
+# reruns the person detector when tracking/presence confidence drops below
+# these thresholds. Lower values skip the detector on more frames.
+_DETECTION_CONFIDENCE = float(os.getenv("POSE_DETECTION_CONFIDENCE", "0.5"))
+_PRESENCE_CONFIDENCE = float(os.getenv("POSE_PRESENCE_CONFIDENCE", "0.5"))
+_TRACKING_CONFIDENCE = float(os.getenv("POSE_TRACKING_CONFIDENCE", "0.5"))
+
+
+def landmarks_to_dicts(landmarks: np.ndarray) -> List[Dict]:
+    """Per-landmark dicts (id, x, y, z, visibility) for callers that need the old layout"""
+    return [
+        {"id": idx, **dict(zip(_LANDMARK_FIELDS, values))}
+        for idx, values in enumerate(np.asarray(landmarks).tolist())
+    ]
+
+
+@dataclass
+class PoseArrays:
+    """
+    Columnar (SoA) view of a pose run: one row per frame.
+    Frames without a full pose have zeroed landmarks/visibility and
+    mask False; missing metrics are NaN.
+    from_frames stores x, y, z and visibility as separate contiguous
+    (N, 33) planes; landmarks is an (N, 33, 3) view over the first three.
+    """
+    landmarks: np.ndarray    # (N, 33, 3) float32 x, y, z
+    visibility: np.ndarray   # (N, 33) float32
+    mask: np.ndarray         # (N,) bool, frame has a full pose
+    metrics: np.ndarray      # (N, K) float32
+    metric_names: Tuple[str, ...]
+
+    @classmethod
+    def from_frames(cls, frames: List[Dict], metric_names: Tuple[str, ...] = POSE_METRIC_NAMES) -> "PoseArrays":
+        """
+        Pack report["frames"]; landmarks may be (33, 4) arrays or legacy dicts.
+        """
+        n = len(frames)
+        # x, y, z, visibility planes, each (N, 33) and contiguous
+        planes = np.zeros((4, n, NUM_LANDMARKS), dtype=np.float32)
+        mask = np.zeros(n, dtype=bool)
+        metrics = np.full((n, len(metric_names)), np.nan, dtype=np.float32)
+        
+        posed = []
+        for i, frame in enumerate(frames):
+            landmarks = frame.get("landmarks", [])
+            if len(landmarks) >= NUM_LANDMARKS:
+                if isinstance(landmarks, np.ndarray):
+                    posed.append(landmarks[:NUM_LANDMARKS])
+                else:
+                    posed.append([
+                        (lm["x"], lm["y"], lm["z"], lm.get("visibility", 1.0)) for lm in landmarks[:NUM_LANDMARKS]
+                    ])
+                mask[i] = True
+            frame_metrics = frame.get("metrics")
+            if frame_metrics:
+                metrics[i] = [frame_metrics.get(name, np.nan) for name in metric_names]
+        
+        if posed:
+            # One scatter of every posed frame: (P, 33, 4) -> (4, P, 33)
+            planes[:, mask] = np.asarray(posed, dtype=np.float32).transpose(2, 0, 1)
+        
+        return cls(
+            landmarks=np.moveaxis(planes[:3], 0, -1),
+            visibility=planes[VISIBILITY],
+            mask=mask,
+            metrics=metrics,
+            metric_names=tuple(metric_names),
+        )
+
+    def metric(self, name: str) -> np.ndarray:
+        """(N,) column for one metric, all NaN if the pose layer does not produce it"""
+        if name in self.metric_names:
+            return self.metrics[:, self.metric_names.index(name)]
+        return np.full(len(self), np.nan, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+
+@lru_cache(maxsize=None)
+def _read_model(model_path: str) -> bytes:
+    """Model file bytes, read once per process and shared by every landmarker"""
+    with open(model_path, "rb") as f:
+        return f.read()
+
+
 class PoseDetector:
+    # Delegate that loaded each model path (None if it could not be loaded),
+    # probed once per process. Landmarkers themselves are created per video.
+    _delegates: Dict[str, Any] = {}
+    _delegates_lock = threading.Lock()
+
     def __init__(self, model_path: Optional[str] = None):
         """
         Initialize MediaPipe Pose detector using Tasks API
         """
         self.model_path = model_path or self._get_default_model_path()
-        self.detector = None
-        
+        self.available = self._probe_model(self.model_path)
+    
+    @classmethod
+    def _probe_model(cls, model_path: str) -> bool:
+        """Whether landmarkers can be created for model_path (False = mock mode)"""
         if not MP_AVAILABLE:
             print("WARNING: MediaPipe not installed. Using mock pose detector.")
-            return
-            
+            return False
+        
+        with cls._delegates_lock:
+            if model_path not in cls._delegates:
+                cls._delegates[model_path] = cls._find_delegate(model_path)
+            return cls._delegates[model_path] is not None
+    
+    @classmethod
+    def _find_delegate(cls, model_path: str):
+        """
+        First delegate the PoseLandmarker model loads with, or None.
+        POSE_DELEGATE=gpu runs inference on the GPU delegate, falling back to CPU.
+        """
+        delegates = [python.BaseOptions.Delegate.CPU]
+        if os.getenv("POSE_DELEGATE", "cpu").lower() == "gpu":
+            delegates.insert(0, python.BaseOptions.Delegate.GPU)
+        
+        for delegate in delegates:
+            try:
+                cls._create_landmarker(model_path, delegate).close()
+                print(f"Pose detector initialized with model: {model_path} ({delegate.name} delegate)")
+                return delegate
+            except Exception as e:
+                print(f"WARNING: Failed to initialize MediaPipe Pose detector ({delegate.name} delegate): {e}")
+        
+        print("Using mock implementation instead.")
+        return None
+    
+    @staticmethod
+    def _create_landmarker(model_path: str, delegate):
+        """New VIDEO-mode PoseLandmarker from the shared model bytes"""
+        base_options = python.BaseOptions(model_asset_buffer=_read_model(model_path), delegate=delegate)
+        options = vision.PoseLandmarkerOptions(
+            base_options=base_options,
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=1,
+            min_pose_detection_confidence=_DETECTION_CONFIDENCE,
+            min_pose_presence_confidence=_PRESENCE_CONFIDENCE,
+            min_tracking_confidence=_TRACKING_CONFIDENCE,
+            output_segmentation_masks=False
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+    
+    @contextmanager
+    def video_consumer(self) -> Iterator[FrameConsumer]:
+        """
+        FramePipeline consumer for one video. VIDEO mode tracks the pose from
+        frame to frame and needs increasing timestamps, so every video gets
+        its own landmarker, closed when the block exits.
+        """
+        landmarker = None
+        if self.available:
+            landmarker = self._create_landmarker(self.model_path, self._delegates[self.model_path])
         try:
-            # Create PoseLandmarker options
-            base_options = python.BaseOptions(model_asset_path=self.model_path)
-            options = vision.PoseLandmarkerOptions(
-                base_options=base_options,
-                running_mode=vision.RunningMode.VIDEO,
-                num_poses=1,
-                min_pose_detection_confidence=0.5,
-                min_pose_presence_confidence=0.5,
-                min_tracking_confidence=0.5,
-                output_segmentation_masks=False
-            )
-            
-            # Create the detector
-            self.detector = vision.PoseLandmarker.create_from_options(options)
-            print(f"Pose detector initialized with model: {self.model_path}")
-            
-        except Exception as e:
-            print(f"WARNING: Failed to initialize MediaPipe Pose detector: {e}")
-            print("Using mock implementation instead.")
-            self.detector = None
+            yield partial(self.process_frame, landmarker=landmarker)
+        finally:
+            if landmarker is not None:
+                landmarker.close()
     
     def _get_default_model_path(self):
         """Get the default model path - check multiple locations"""
@@ -60,7 +215,7 @@ class PoseDetector:
         for path in possible_paths:
             if os.path.exists(path):
                 print(f"Found model at: {path}")
-                return path
+                return resolve_model_variant(path)
         
         # If not found anywhere
         print(f"WARNING: Model file not found in any of these locations: {possible_paths}")
@@ -77,128 +232,123 @@ class PoseDetector:
         Returns: List of frames with landmarks
         """
         # If detector is not available, return mock data
-        if self.detector is None:
+        if not self.available:
             return self._create_mock_report()
         
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        frames_data = []
-        frame_number = 0
-        
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
-                
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Convert to MediaPipe Image
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-            
-            # Calculate timestamp in milliseconds
-            timestamp_ms = int((frame_number / fps) * 1000) if fps > 0 else frame_number * 33
-            
-            # Detect pose landmarks
-            detection_result = self.detector.detect_for_video(mp_image, timestamp_ms)
-            
-            frame_data = {
-                "frame_number": frame_number,
-                "timestamp": frame_number / fps if fps > 0 else 0,
-                "landmarks": []
-            }
-            
-            if detection_result.pose_landmarks:
-                # Take the first pose (we set num_poses=1)
-                landmarks = self._extract_landmarks(detection_result.pose_landmarks[0])
-                frame_data["landmarks"] = landmarks
-                
-                # Calculate key metrics
-                if landmarks:
-                    frame_data["metrics"] = self._calculate_frame_metrics(landmarks)
-            
-            frames_data.append(frame_data)
-            frame_number += 1
-            
-            # Print progress every 10 frames
-            if frame_number % 10 == 0:
-                print(f"Processed {frame_number}/{frame_count} frames...")
-        
-        cap.release()
+        pipeline = FramePipeline(video_path)
+        with self.video_consumer() as process_pose:
+            frames_data, = pipeline.run([process_pose])
+        metric_columns = self._attach_frame_metrics(frames_data)
         
         if output_json:
-            return self._create_pose_report(frames_data, fps, frame_count)
+            return self._create_pose_report(frames_data, pipeline.fps, pipeline.frame_count, metric_columns)
         
         return frames_data
     
-    def _extract_landmarks(self, pose_landmarks) -> List[Dict]:
-        """Extract landmarks with coordinates and visibility"""
-        landmarks = []
-        for idx, landmark in enumerate(pose_landmarks):
-            landmarks.append({
-                "id": idx,
-                "x": float(landmark.x),
-                "y": float(landmark.y),
-                "z": float(landmark.z),
-                "visibility": float(landmark.visibility) if hasattr(landmark, 'visibility') else 1.0
-            })
-        return landmarks
-    
-    def _calculate_frame_metrics(self, landmarks: List[Dict]) -> Dict:
-        """Calculate basic pose metrics for a frame"""
-        metrics = {}
-        
-        # Check if we have enough landmarks
-        if len(landmarks) < 17:  # Need at least up to wrist landmarks
-            return metrics
-        
-        # Get key points (MediaPipe landmarks indices)
-        left_shoulder = landmarks[11]
-        right_shoulder = landmarks[12]
-        left_elbow = landmarks[13]
-        right_elbow = landmarks[14]
-        left_wrist = landmarks[15]
-        right_wrist = landmarks[16]
-        
-        # Calculate elbow angles
-        metrics["left_elbow_angle"] = self._calculate_angle(
-            left_shoulder, left_elbow, left_wrist
-        )
-        metrics["right_elbow_angle"] = self._calculate_angle(
-            right_shoulder, right_elbow, right_wrist
-        )
+    def process_frame(self, frame_number: int, frame_bgr: np.ndarray, frame_rgb: np.ndarray, fps: float,
+                      landmarker=None) -> Dict:
+        """
+        Detect pose landmarks in one decoded frame with the video's landmarker
+        (see video_consumer); without one the frame has no landmarks
+        """
+        frame_data = {
+            "frame_number": frame_number,
+            "timestamp": frame_number / fps if fps > 0 else 0,
+            "landmarks": _NO_LANDMARKS
+        }
         
-        # Calculate shoulder alignment
-        metrics["shoulder_alignment"] = self._calculate_shoulder_alignment(
-            left_shoulder, right_shoulder
-        )
+        if landmarker is None:
+            return frame_data
+        
+        # Convert to MediaPipe Image
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+        
+        # Calculate timestamp in milliseconds
+        timestamp_ms = int((frame_number / fps) * 1000) if fps > 0 else frame_number * 33
+        
+        # Detect pose landmarks
+        detection_result = landmarker.detect_for_video(mp_image, timestamp_ms)
+        
+        if detection_result.pose_landmarks:
+            # Take the first pose (we set num_poses=1)
+            # Metrics are computed for all frames at once in _attach_frame_metrics
+            frame_data["landmarks"] = self._extract_landmarks(detection_result.pose_landmarks[0])
         
-        return metrics
+        return frame_data
     
-    def _calculate_angle(self, a: Dict, b: Dict, c: Dict) -> float:
-        """Calculate angle between three points"""
-        # Convert to numpy arrays
-        a_vec = np.array([a["x"], a["y"]])
-        b_vec = np.array([b["x"], b["y"]])
-        c_vec = np.array([c["x"], c["y"]])
-        
-        # Calculate vectors
-        ba = a_vec - b_vec
-        bc = c_vec - b_vec
-        
-        # Calculate angle
-        cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-        angle = np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
-        
-        return float(angle)
+    def create_report(self, frames_data: List, fps: float, frame_count: int) -> Dict:
+        """
+        Build the pose report for frames collected via video_consumer
+        """
+        if not self.available:
+            return self._create_mock_report()
+        metric_columns = self._attach_frame_metrics(frames_data)
+        return self._create_pose_report(frames_data, fps, frame_count, metric_columns)
+    
+    def _extract_landmarks(self, pose_landmarks) -> np.ndarray:
+        """Extract landmarks as a (33, 4) float32 array of x, y, z, visibility"""
+        return np.asarray(
+            [[lm.x, lm.y, lm.z, getattr(lm, "visibility", 1.0)] for lm in pose_landmarks],
+            dtype=np.float32
+        ).reshape(-1, 4)
+    
+    def _attach_frame_metrics(self, frames_data: List[Dict]) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Compute elbow angles and shoulder tilt for every posed frame in one
+        vectorized pass and store them as each frame's metrics dict.
+        Angles of arms with an occluded joint are NaN in the columns and left
+        out of the frame's metrics dict.
+        Returns the metric columns (one value per posed frame) for the summary.
+        """
+        posed = [frame for frame in frames_data if len(frame["landmarks"])]
+        if not posed:
+            return None
+        
+        L = np.stack([frame["landmarks"] for frame in posed])
+        if L.shape[1] < 17:  # Need at least up to wrist landmarks
+            for frame in posed:
+                frame["metrics"] = {}
+            return None
+        
+        columns = self._calculate_metrics_batch(L)
+        names = list(columns)
+        for frame, row in zip(posed, np.column_stack(list(columns.values())).tolist()):
+            frame["metrics"] = {name: value for name, value in zip(names, row) if value == value}  # drop NaN
+        return columns
     
-    def _calculate_shoulder_alignment(self, left_shoulder: Dict, right_shoulder: Dict) -> float:
-        """Calculate shoulder alignment (tilt)"""
-        return abs(left_shoulder["y"] - right_shoulder["y"])
+    def _calculate_metrics_batch(self, L: np.ndarray) -> Dict[str, np.ndarray]:
+        """Per-frame metrics for a (N, 33, 4) landmark stack, one (N,) array per metric"""
+        if NUMBA_AVAILABLE:
+            # One fused, threaded pass over the stack instead of several NumPy sweeps
+            out = np.empty((len(L), len(_ARMS) + 1), dtype=np.float32)
+            visible = np.empty((len(L), len(_ARMS)), dtype=np.bool_)
+            process_landmarks_batch(np.ascontiguousarray(L, dtype=np.float32), _ARMS, _MIN_VISIBILITY, out, visible)
+            return {
+                "left_elbow_angle": out[:, 0],
+                "right_elbow_angle": out[:, 1],
+                "shoulder_alignment": out[:, 2],
+            }
+        
+        def elbow_angles(shoulder, elbow, wrist):
+            # Occluded joints give garbage angles: only measure fully visible arms
+            visible = L[:, [shoulder, elbow, wrist], VISIBILITY].min(axis=1) > _MIN_VISIBILITY
+            angles = np.full(len(L), np.nan, dtype=np.float32)
+            arm = L[visible]
+            ba = arm[:, shoulder, :2] - arm[:, elbow, :2]
+            bc = arm[:, wrist, :2] - arm[:, elbow, :2]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cos = (ba * bc).sum(-1) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1))
+            angles[visible] = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+            return angles
+        
+        return {
+            "left_elbow_angle": elbow_angles(*_LEFT_ARM),
+            "right_elbow_angle": elbow_angles(*_RIGHT_ARM),
+            "shoulder_alignment": np.abs(L[:, SHOULDER_L, Y] - L[:, SHOULDER_R, Y]),
+        }
     
-    def _create_pose_report(self, frames_data: List, fps: float, frame_count: int) -> Dict:
+    def _create_pose_report(self, frames_data: List, fps: float, frame_count: int,
+                            metric_columns: Optional[Dict[str, np.ndarray]] = None) -> Dict:
         """Create comprehensive pose analysis report"""
         report = {
             "metadata": {
@@ -208,8 +358,8 @@ class PoseDetector:
             },
             "frames": frames_data,
             "summary": {
-                "average_elbow_angles": self._calculate_average_angles(frames_data),
-                "frames_with_landmarks": len([f for f in frames_data if f["landmarks"]]),
+                "average_elbow_angles": self._calculate_average_angles(frames_data, metric_columns),
+                "frames_with_landmarks": sum(1 for f in frames_data if len(f["landmarks"])),
                 "total_frames_processed": len(frames_data)
             }
         }
@@ -231,19 +381,25 @@ class PoseDetector:
             }
         }
     
-    def _calculate_average_angles(self, frames_data: List) -> Dict:
+    def _calculate_average_angles(self, frames_data: List,
+                                  metric_columns: Optional[Dict[str, np.ndarray]] = None) -> Dict:
         """Calculate average angles across all frames"""
-        left_angles = []
-        right_angles = []
-        
-        for frame in frames_data:
-            if "metrics" in frame:
-                left_angles.append(frame["metrics"].get("left_elbow_angle", 0))
-                right_angles.append(frame["metrics"].get("right_elbow_angle", 0))
+        if metric_columns is None:
+            # Frames not built by _attach_frame_metrics: gather the columns once
+            with_metrics = [frame["metrics"] for frame in frames_data if "metrics" in frame]
+            metric_columns = {
+                name: np.fromiter((m.get(name, np.nan) for m in with_metrics), dtype=np.float32, count=len(with_metrics))
+                for name in ("left_elbow_angle", "right_elbow_angle")
+            }
         
+        # Unmeasured (occluded) angles are NaN and do not count towards the mean
+        left_angles = metric_columns["left_elbow_angle"]
+        left_angles = left_angles[np.isfinite(left_angles)]
+        right_angles = metric_columns["right_elbow_angle"]
+        right_angles = right_angles[np.isfinite(right_angles)]
         return {
-            "left_elbow": np.mean(left_angles) if left_angles else 0,
-            "right_elbow": np.mean(right_angles) if right_angles else 0
+            "left_elbow": float(left_angles.mean()) if left_angles.size else 0,
+            "right_elbow": float(right_angles.mean()) if right_angles.size else 0
         }
 
 # Singleton instance
@@ -3,13 +3,96 @@ Video processing utilities
 """
 from app.services.bowling_analyzer import BowlingAnalyzer
 from app.services.batting_analyzer import BattingAnalyzer
-from app.services.pose_service import PoseDetector
+from app.services.pose_service import pose_detector
 from app.core import models
 from app.database import SessionLocal
+from sqlalchemy import update
 import os
+import json
+import shutil
+import subprocess
+import threading
+from functools import lru_cache
 import cv2
 import numpy as np
-from typing import Dict, Any    
+from typing import Dict, Any, Optional
+
+from app.services.frame_pipeline import iter_frame_batches, open_video_capture
+
+_FFPROBE = shutil.which("ffprobe")
+
+def probe_video(video_path: str) -> Dict[str, Any]:
+    """
+    Container-level facts about a video, probed once per file version:
+    opened, readable (first frame decodes), frame_count, fps, width, height.
+    Uses ffprobe when installed (headers plus one decoded frame), else one
+    OpenCV open. Cached on (path, mtime, size), so validation and metadata
+    extraction of the same upload share a single probe.
+    """
+    stat = os.stat(video_path)
+    return dict(_probe_video(video_path, stat.st_mtime_ns, stat.st_size))
+
+@lru_cache(maxsize=256)
+def _probe_video(video_path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    probe = _ffprobe_video(video_path) if _FFPROBE else None
+    return probe if probe is not None else _opencv_probe_video(video_path)
+
+def _ffprobe_video(video_path: str) -> Optional[Dict[str, Any]]:
+    """ffprobe the first video stream; None if ffprobe itself fails"""
+    try:
+        completed = subprocess.run(
+            [_FFPROBE, "-v", "quiet", "-print_format", "json",
+             "-show_format", "-show_streams", "-select_streams", "v:0",
+             # Decode only the first frame to prove the stream is readable
+             "-count_frames", "-read_intervals", "%+#1", video_path],
+            capture_output=True, timeout=30, check=False
+        )
+        info = json.loads(completed.stdout or b"{}")
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+    
+    streams = info.get("streams") or []
+    if not streams:
+        return {"opened": False, "readable": False}
+    stream = streams[0]
+    
+    fps = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+    frame_count = int(stream.get("nb_frames") or 0)
+    if not frame_count:
+        duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0)
+        frame_count = int(round(duration * fps))
+    return {
+        "opened": True,
+        "readable": int(stream.get("nb_read_frames") or 0) > 0,
+        "frame_count": frame_count,
+        "fps": fps,
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+    }
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """ffprobe frame rate such as '30000/1001' as a float (0.0 if unknown)"""
+    try:
+        num, _, den = (rate or "").partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def _opencv_probe_video(video_path: str) -> Dict[str, Any]:
+    cap = open_video_capture(video_path, hw_accel=False)
+    try:
+        if not cap.isOpened():
+            return {"opened": False, "readable": False}
+        return {
+            "opened": True,
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "readable": cap.grab(),
+        }
+    finally:
+        cap.release()
 
 def extract_video_metadata(video_path: str) -> Dict[str, Any]:
     """
@@ -19,27 +102,23 @@ def extract_video_metadata(video_path: str) -> Dict[str, Any]:
         return {"error": f"File not found: {video_path}"}
     
     try:
-        cap = cv2.VideoCapture(video_path)
+        probe = probe_video(video_path)
         
-        if not cap.isOpened():
+        if not probe["opened"]:
             return {"error": "Could not open video file"}
         
         # Get video properties
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_count = probe["frame_count"]
+        fps = probe["fps"]
         
         # Calculate duration
         duration = frame_count / fps if fps > 0 else 0
         
-        cap.release()
-        
         return {
             "frame_count": frame_count,
             "fps": fps,
-            "width": width,
-            "height": height,
+            "width": probe["width"],
+            "height": probe["height"],
             "duration": duration,
             "file_size": os.path.getsize(video_path),
             "file_format": os.path.splitext(video_path)[1].lower()
@@ -50,26 +129,30 @@ def extract_video_metadata(video_path: str) -> Dict[str, Any]:
 
 def extract_frames(video_path: str, interval: int = 1) -> np.ndarray:
     """
-    Extract frames from video at specified interval
+    Extract frames from video at specified interval.
+    The output array is allocated once from the container's frame count and
+    filled batch by batch from iter_frame_batches.
     """
-    frames = []
-    cap = cv2.VideoCapture(video_path)
+    probe = probe_video(video_path) if os.path.exists(video_path) else {}
+    n_out = (max(probe.get("frame_count", 0), 0) + interval - 1) // interval
+    frames = np.empty((n_out, probe.get("height", 0), probe.get("width", 0), 3), np.uint8)
     
-    frame_idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_idx % interval == 0:
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame_rgb)
-        
-        frame_idx += 1
+    k = 0
+    for batch in iter_frame_batches(video_path, interval=interval):
+        # Some backends report no size; re-size from the first batch
+        if k == 0 and frames.shape[1:] != batch.shape[1:]:
+            frames = np.empty((n_out,) + batch.shape[1:], np.uint8)
+        # Frame counts are container estimates; grow if it undercounted
+        if k + len(batch) > len(frames):
+            extra = np.empty((max(k, len(batch)),) + batch.shape[1:], np.uint8)
+            frames = np.concatenate([frames[:k], extra])
+        frames[k:k + len(batch)] = batch
+        k += len(batch)
     
-    cap.release()
-    return np.array(frames)
+    return frames[:k]
+
+_THUMBNAIL_FRAME = 30  # frames decoded before grabbing the thumbnail
+_THUMBNAIL_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 75, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
 
 def create_thumbnail(video_path: str, output_path: str = None) -> str:
     """
@@ -83,17 +166,20 @@ def create_thumbnail(video_path: str, output_path: str = None) -> str:
             f"thumb_{os.path.basename(video_path).split('.')[0]}.jpg"
         )
     
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video_capture(video_path, hw_accel=False)
     
-    # Get middle frame
+    # Frame about one second in, reached by decoding forward rather than a
+    # container seek to the middle of the file
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    middle_frame = total_frames // 2
-    
-    cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
-    ret, frame = cap.read()
+    grabbed = 0
+    for _ in range(max(1, min(_THUMBNAIL_FRAME, total_frames))):
+        if not cap.grab():
+            break
+        grabbed += 1
+    ret, frame = cap.retrieve() if grabbed else (False, None)
     
     if ret:
-        cv2.imwrite(output_path, frame)
+        cv2.imwrite(output_path, frame, _THUMBNAIL_JPEG_PARAMS)
     
     cap.release()
     return output_path if ret else None
@@ -124,16 +210,13 @@ def validate_video_file(file_path: str) -> Dict[str, Any]:
             "error": f"File size {file_size_mb:.1f}MB exceeds limit of {max_size_mb}MB"
         }
     
-    # Try to open with OpenCV
-    cap = cv2.VideoCapture(file_path)
-    if not cap.isOpened():
+    # Try to open the video (probe is cached for the later metadata read)
+    probe = probe_video(file_path)
+    if not probe["opened"]:
         return {"valid": False, "error": "Cannot open video file"}
     
     # Check if video has frames
-    ret, frame = cap.read()
-    cap.release()
-    
-    if not ret:
+    if not probe["readable"]:
         return {"valid": False, "error": "Video has no readable frames"}
     
     return {"valid": True, "file_size_mb": file_size_mb, "extension": file_ext}
@@ -142,67 +225,108 @@ def process_video_background(session_id: int, video_path: str, session_type: str
     """
     Background task to process video
     """
+    try:
+        found = _mark_processing(session_id)
+    except Exception as e:
+        print(f"Error processing video: {e}")
+        return
+    if not found:
+        print(f"Session {session_id} not found")
+        return
+    
+    try:
+        analysis_data = _analyze_video(video_path, session_type)
+    except Exception as e:
+        print(f"Error processing video: {e}")
+        analysis_data = None
+    _save_analysis(session_id, session_type, analysis_data)
+
+def _mark_processing(session_id: int) -> bool:
+    """Set the session status to processing; False if it does not exist"""
     db = SessionLocal()
     try:
-        # Update session status
-        session = db.query(models.Session).filter(models.Session.id == session_id).first()
-        if not session:
-            print(f"Session {session_id} not found")
-            return
-        
-        session.status = "processing"
+        # Plain UPDATE; the row is never loaded
+        result = db.execute(
+            update(models.Session).where(models.Session.id == session_id).values(status="processing")
+        )
         db.commit()
+        return result.rowcount > 0
+    finally:
+        db.close()
+
+_ANALYZERS: Dict[str, Any] = {}
+_ANALYZERS_LOCK = threading.Lock()
+
+def _get_analyzer(session_type: str):
+    """
+    Analyzer for the session type, created once per process so model
+    weights are loaded once rather than per video
+    """
+    with _ANALYZERS_LOCK:
+        if session_type not in _ANALYZERS:
+            analyzer_cls = BowlingAnalyzer if session_type == "bowling" else BattingAnalyzer
+            _ANALYZERS[session_type] = analyzer_cls(pose_detector=pose_detector)
+        return _ANALYZERS[session_type]
 
-        # Process video based on type
+def _analyze_video(video_path: str, session_type: str) -> Dict[str, Any]:
+    """Run the analysis for the session type; returns Analysis column values"""
+    # Process video based on type
+    analysis_data = {}
+    if session_type == "bowling":
+        result = _get_analyzer("bowling").analyze_bowling_action(video_path)
+        # Map bowling metrics to analysis model
+        metrics = result.get("bowling_metrics", {})
+        analysis_data = {
+            "elbow_extension": metrics.get("elbow_extension"),
+            "arm_type": metrics.get("arm_type"),
+            "release_point": metrics.get("release_point"),
+            "swing_type": metrics.get("swing_type"),
+            "front_foot_landing": metrics.get("front_foot_landing"),
+            "icc_compliant": metrics.get("icc_compliant"),
+            "recommendations": metrics.get("recommendations", []),
+        }
+    elif session_type == "batting":
+        result = _get_analyzer("batting").analyze_video(video_path)
+        metrics = result.get("batting_metrics", {})
+        analysis_data = {
+            "stance_type": metrics.get("stance_type"),
+            "weight_distribution": metrics.get("weight_distribution"),
+            "bat_angle": metrics.get("bat_angle"),
+            "head_position": metrics.get("head_position"),
+            "recommendations": metrics.get("recommendations", []),
+        }
+    else:
+        # Generic pose analysis
+        result = pose_detector.process_video(video_path)
+        # No specific metrics to save yet – you could store raw data elsewhere
         analysis_data = {}
-        if session_type == "bowling":
-            analyzer = BowlingAnalyzer()
-            result = analyzer.analyze_video(video_path)  # ensure method name matches
-            # Map bowling metrics to analysis model
-            metrics = result.get("bowling_metrics", {})
-            analysis_data = {
-                "elbow_extension": metrics.get("elbow_extension"),
-                "arm_type": metrics.get("arm_type"),
-                "release_point": metrics.get("release_point"),
-                "swing_type": metrics.get("swing_type"),
-                "front_foot_landing": metrics.get("front_foot_landing"),
-                "icc_compliant": metrics.get("icc_compliant"),
-                "recommendations": metrics.get("recommendations", []),
-            }
-        elif session_type == "batting":
-            analyzer = BattingAnalyzer()
-            result = analyzer.analyze_video(video_path)
-            metrics = result.get("batting_metrics", {})
-            analysis_data = {
-                "stance_type": metrics.get("stance_type"),
-                "weight_distribution": metrics.get("weight_distribution"),
-                "bat_angle": metrics.get("bat_angle"),
-                "head_position": metrics.get("head_position"),
-                "recommendations": metrics.get("recommendations", []),
-            }
-        else:
-            # Generic pose analysis
-            result = pose_detector.process_video(video_path)
-            # No specific metrics to save yet – you could store raw data elsewhere
-            analysis_data = {}
-
-        # Save analysis to database
-        analysis = models.Analysis(
-            session_id=session_id,
-            analysis_type=session_type,
-            **analysis_data
-        )
-        db.add(analysis)
+    return analysis_data
 
-        # Update session status to completed
-        session.status = "completed"
+def _save_analysis(session_id: int, session_type: str, analysis_data: Optional[Dict[str, Any]]):
+    """Save the Analysis row and mark the session completed, or failed if analysis_data is None"""
+    db = SessionLocal()
+    try:
+        if analysis_data is not None:
+            # Save analysis to database
+            db.add(models.Analysis(
+                session_id=session_id,
+                analysis_type=session_type,
+                **analysis_data
+            ))
+        
+        # Terminal status goes out in the same transaction as the analysis
+        status = "failed" if analysis_data is None else "completed"
+        db.execute(update(models.Session).where(models.Session.id == session_id).values(status=status))
         db.commit()
 
     except Exception as e:
         print(f"Error processing video: {e}")
-        # If session exists, mark as failed
-        if session:
-            session.status = "failed"
+        db.rollback()
+        # If session exists, mark as failed; the DB itself may be what failed
+        try:
+            db.execute(update(models.Session).where(models.Session.id == session_id).values(status="failed"))
             db.commit()
+        except Exception as status_error:
+            print(f"Could not mark session {session_id} as failed: {status_error}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,7 +1,8 @@
 """
 Celery tasks for background processing
 """
-from celery import Celery
+from celery import Celery, group
+from celery.signals import worker_process_init
 import os
 from dotenv import load_dotenv
 
@@ -27,13 +28,57 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=10,
+    # Heavy video tasks get their own queue so GPU workers can be sized to
+    # the GPU count, e.g.
+    #   celery -A app.workers.tasks.celery_app worker -Q gpu -c $NUM_GPUS --pool=solo
+    # while light tasks stay responsive on the other queues
+    task_routes={
+        'process_video_task': {'queue': 'gpu'},
+        'batch_process_sessions': {'queue': 'orchestrator'},
+        'cleanup_old_sessions': {'queue': 'maintenance'},
+    },
+    # Unset keeps Celery's default (one process per CPU)
+    worker_concurrency=int(os.environ['CELERY_WORKER_CONCURRENCY']) if os.getenv('CELERY_WORKER_CONCURRENCY') else None,
 )
 
+@worker_process_init.connect
+def _pin_threads(**kwargs):
+    """
+    Split the CPU cores between worker processes so OpenCV, OpenMP/BLAS and
+    torch thread pools do not oversubscribe them. Runs before _warm_models,
+    so the env limits are set before those libraries load in the child.
+    """
+    concurrency = int(os.getenv('CELERY_WORKER_CONCURRENCY') or os.cpu_count() or 1)
+    n = str(max(1, (os.cpu_count() or 1) // concurrency))
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ.setdefault(var, n)
+    
+    import cv2
+    import torch
+    cv2.setNumThreads(int(os.environ['OMP_NUM_THREADS']))
+    torch.set_num_threads(int(os.environ['OMP_NUM_THREADS']))
+
+@worker_process_init.connect
+def _warm_models(**kwargs):
+    """
+    Load the pose and ball models in each worker process before its first
+    task, so model and GPU context setup is not paid by a request. A model
+    that fails to load here is logged and loaded again by the first task.
+    """
+    from app.services.video_processor import _get_analyzer
+    
+    for session_type in ("bowling", "batting"):
+        try:
+            _get_analyzer(session_type)
+        except Exception as e:
+            print(f"WARNING: Could not warm the {session_type} analyzer: {e}")
+
 @celery_app.task(bind=True, name='process_video_task')
 def process_video_task(self, session_id: int):
     """
     Celery task to process video asynchronously
     """
+    from sqlalchemy import update
     from app.services.integration_service import integration_service
     from app.database import SessionLocal
     from app.core.models import Session
@@ -62,11 +107,9 @@ def process_video_task(self, session_id: int):
             }
             
     except Exception as e:
-        # Update session status to failed
-        session = db.query(Session).filter(Session.id == session_id).first()
-        if session:
-            session.status = "failed"
-            db.commit()
+        # Update session status to failed (single UPDATE, row is not loaded)
+        db.execute(update(Session).where(Session.id == session_id).values(status="failed"))
+        db.commit()
         
         return {
             "status": "FAILED",
@@ -82,14 +125,15 @@ def batch_process_sessions(session_ids: list):
     """
     Process multiple sessions in batch
     """
-    results = []
-    for session_id in session_ids:
-        result = process_video_task.delay(session_id)
-        results.append(result.id)
+    # One group publishes every task in a single broker round-trip
+    group_result = group(process_video_task.s(session_id) for session_id in session_ids).apply_async()
+    # Stored so the batch can be tracked later with GroupResult.restore(group_id)
+    group_result.save()
     
     return {
         "status": "BATCH_STARTED",
-        "task_ids": results,
+        "group_id": group_result.id,
+        "task_ids": [result.id for result in group_result.results],
         "total_sessions": len(session_ids)
     }
 
@@ -98,8 +142,9 @@ def cleanup_old_sessions(days_old: int = 30):
     """
     Clean up old session data
     """
+    from sqlalchemy import delete, update
     from app.database import SessionLocal
-    from app.core.models import Session
+    from app.core.models import Session, Analysis, BallTrackingAnalysis, Delivery
     from datetime import datetime, timedelta
     import os
     
@@ -107,29 +152,34 @@ def cleanup_old_sessions(days_old: int = 30):
     cutoff_date = datetime.utcnow() - timedelta(days=days_old)
     
     try:
-        # Find old sessions
+        # Find old sessions; only the columns needed for cleanup
         old_sessions = db.query(Session).filter(
             Session.created_at < cutoff_date,
             Session.status == "completed"
-        ).all()
+        ).with_entities(Session.id, Session.video_path).all()
         
-        deleted_count = 0
-        for session in old_sessions:
+        ids = [session_id for session_id, _ in old_sessions]
+        for _, video_path in old_sessions:
             # Delete video file
-            if session.video_path and os.path.exists(session.video_path):
-                os.remove(session.video_path)
+            if video_path and os.path.exists(video_path):
+                os.remove(video_path)
+        
+        if ids:
+            # Bulk statements skip ORM cascades, so apply them explicitly:
+            # analyses are deleted, tracking rows and deliveries are detached
+            db.execute(delete(Analysis).where(Analysis.session_id.in_(ids)))
+            db.execute(update(BallTrackingAnalysis).where(BallTrackingAnalysis.session_id.in_(ids)).values(session_id=None))
+            db.execute(update(Delivery).where(Delivery.session_id.in_(ids)).values(session_id=None))
             
             # Delete from database
-            db.delete(session)
-            deleted_count += 1
-        
+            db.query(Session).filter(Session.id.in_(ids)).delete(synchronize_session=False)
         db.commit()
         
         return {
             "status": "CLEANUP_COMPLETED",
-            "deleted_sessions": deleted_count,
+            "deleted_sessions": len(ids),
             "cutoff_date": cutoff_date.isoformat()
         }
         
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,11 +1,21 @@
 # test_api.py - Place in root directory
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
 from pathlib import Path
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive connection pool shared by every request
+session = requests.Session()
+session.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.1)
+))
+
 def test_api():
     print("🚀 Testing CRIC-V API")
     
@@ -19,7 +29,7 @@ def test_api():
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/auth/register", json=register_data)
+        response = session.post(f"{BASE_URL}/auth/register", json=register_data)
         print(f"   Status: {response.status_code}")
         print(f"   Response: {response.json()}")
     except Exception as e:
@@ -33,7 +43,7 @@ def test_api():
     }
     
     try:
-        response = requests.post(
+        response = session.post(
             f"{BASE_URL}/auth/token",
             data={"username": "test_coach", "password": "testpassword123"},
             headers={"Content-Type": "application/x-www-form-urlencoded"}
@@ -55,7 +65,7 @@ def test_api():
     }
     
     try:
-        response = requests.post(
+        response = session.post(
             f"{BASE_URL}/users/players",
             json=player_data,
             headers=headers
@@ -76,7 +86,7 @@ def test_api():
     }
     
     try:
-        response = requests.post(
+        response = session.post(
             f"{BASE_URL}/sessions/",
             json=session_data,
             headers=headers
@@ -90,7 +100,7 @@ def test_api():
     # 5. Check API health
     print("\n5. Checking API health...")
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = session.get(f"{BASE_URL}/health")
         print(f"   Health: {response.json()}")
     except Exception as e:
         print(f"   Error: {e}")
@@ -104,4 +114,5 @@ def test_api():
     return token, player_id, session_id
 
 if __name__ == "__main__":
-    test_api()
\ No newline at end of file
+    with session:
+        test_api()
\ No newline at end of file
@@ -0,0 +1,34 @@
+# tests/conftest.py
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.database
+from app.database import Base
+
+
+@pytest.fixture
+def sample_video(tmp_path):
+    """Short synthetic clip whose frame i is filled with grey level 8 * i"""
+    path = str(tmp_path / "sample.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25.0, (64, 48))
+    for i in range(24):
+        writer.write(np.full((48, 64, 3), 8 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def db_sessions(monkeypatch):
+    """In-memory database; app.database.SessionLocal is pointed at it for the test"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(app.database, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
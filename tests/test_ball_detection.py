@@ -2,7 +2,8 @@ import cv2
 from app.services.ball_detector import BallDetector
 
 detector = BallDetector(model_path="models/cricket_ball_detector.pt")
-cap = cv2.VideoCapture("data/raw_videos/sample.mp4")
+cap = cv2.VideoCapture("data/raw_videos/sample.mp4", cv2.CAP_FFMPEG)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
 while cap.isOpened():
     ret, frame = cap.read()
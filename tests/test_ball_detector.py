@@ -0,0 +1,37 @@
+# tests/test_ball_detector.py
+from types import SimpleNamespace
+
+import torch
+
+from app.services.advanced_ball_detector import get_ball_detector
+from app.services.frame_pipeline import FRAME_BATCH_SIZE
+
+
+def _fake_model(calls):
+    """Stand-in for the YOLO model: one ball per frame, boxed at its grey level"""
+    def model(frames, verbose=False, half=False):
+        frames = frames if isinstance(frames, list) else [frames]
+        calls.append(len(frames))
+        return [
+            SimpleNamespace(boxes=[SimpleNamespace(
+                cls=torch.tensor([0]), conf=torch.tensor([0.9]),
+                xyxy=torch.tensor([[float(frame.mean())] * 4]),
+            )])
+            for frame in frames
+        ]
+    return model
+
+
+class TestBallDetector:
+    def test_video_runs_in_batches(self, sample_video, monkeypatch):
+        detector = get_ball_detector()
+        calls = []
+        monkeypatch.setattr(detector, "model", _fake_model(calls))
+        monkeypatch.setattr(detector, "ball_class_id", 0)
+
+        detections = detector.detect_ball_in_video(sample_video)
+
+        assert calls == [FRAME_BATCH_SIZE, 24 - FRAME_BATCH_SIZE]
+        assert [d["frame"] for d in detections] == list(range(24))
+        # Frame numbers line up with the frames that produced them
+        assert [round(d["bbox"][0] / 8) for d in detections] == list(range(24))
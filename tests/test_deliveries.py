@@ -0,0 +1,85 @@
+# tests/test_deliveries.py
+from app.core.models import Delivery
+from app.services.batting_analyzer import BattingAnalyzer
+from app.services.bowling_analyzer import BowlingAnalyzer, BowlingMetrics
+
+# Ball track with a clear jump between frames 1 and 2 (bat contact at frame 2)
+_CONTACT_TRAJECTORY = {
+    "points_2d": [
+        {"frame": 0, "x": 0.5, "y": 0.5},
+        {"frame": 1, "x": 0.5, "y": 0.5},
+        {"frame": 2, "x": 0.7, "y": 0.4},
+        {"frame": 3, "x": 0.9, "y": 0.3},
+    ]
+}
+
+
+class TestBattingDeliveries:
+    def _analyzer(self, monkeypatch):
+        analyzer = BattingAnalyzer()
+        # Skip ball model inference on the synthetic clip and feed a known track instead
+        monkeypatch.setattr(analyzer.ball_detector, "process_frame", lambda *args: [])
+        monkeypatch.setattr(analyzer.ball_detector, "trajectory_from_detections",
+                            lambda detections: dict(_CONTACT_TRAJECTORY))
+        return analyzer
+
+    def test_deliveries_written_in_one_flush(self, sample_video, db_sessions, monkeypatch):
+        analyzer = self._analyzer(monkeypatch)
+
+        result = analyzer.analyze_video(sample_video, session_id=1)
+        analyzer.analyze_video(sample_video, session_id=1)
+
+        assert result["batting_metrics"]["contact_point"]["frame"] == 2
+        with db_sessions() as db:
+            assert db.query(Delivery).count() == 0
+        assert analyzer.flush_deliveries() == 2
+        with db_sessions() as db:
+            deliveries = db.query(Delivery).filter(Delivery.session_id == 1).all()
+        assert len(deliveries) == 2
+        assert deliveries[0].shot_type == "drive"
+        assert analyzer._pending_deliveries == []
+
+    def test_next_session_writes_previous(self, sample_video, db_sessions, monkeypatch):
+        analyzer = self._analyzer(monkeypatch)
+
+        analyzer.analyze_video(sample_video, session_id=1)
+        analyzer.analyze_video(sample_video, session_id=3)
+
+        with db_sessions() as db:
+            assert [d.session_id for d in db.query(Delivery)] == [1]
+        assert [d.session_id for d in analyzer._pending_deliveries] == [3]
+
+    def test_no_contact_writes_nothing(self, sample_video, db_sessions, monkeypatch):
+        analyzer = BattingAnalyzer()
+        monkeypatch.setattr(analyzer.ball_detector, "process_frame", lambda *args: [])
+
+        analyzer.analyze_video(sample_video, session_id=2)
+        analyzer.flush_deliveries()
+
+        with db_sessions() as db:
+            assert db.query(Delivery).count() == 0
+
+
+class TestBowlingDeliveries:
+    def _save(self, analyzer, session_id, db=None):
+        metrics = BowlingMetrics(elbow_extension=8.0, release_point={"x": 0.4, "y": 0.2, "z": 0.0})
+        analyzer._save_delivery_to_db(session_id, {"pitch_landing": {"x": 0.5, "y": 0.6}}, 132.5, 0.0, metrics, db=db)
+
+    def test_delivery_numbers_follow_the_database(self, db_sessions):
+        # Two analyzers (e.g. two workers) saving into the same session
+        first, second = BowlingAnalyzer(), BowlingAnalyzer()
+        self._save(first, 1)
+        self._save(second, 1)
+        with db_sessions() as db:
+            # A row written elsewhere is picked up by the next save
+            db.add(Delivery(session_id=1, delivery_number=7))
+            db.commit()
+            self._save(first, 1, db=db)
+            self._save(first, 2, db=db)
+
+            numbers = [d.delivery_number for d in db.query(Delivery).order_by(Delivery.id)]
+            saved = db.query(Delivery).filter(Delivery.session_id == 1).first()
+        assert numbers == [1, 2, 7, 8, 1]
+        assert saved.speed_kmh == 132.5
+        assert saved.elbow_extension == 8.0
+        assert saved.pitch_landing_x == 0.5
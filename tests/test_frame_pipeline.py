@@ -0,0 +1,82 @@
+# tests/test_frame_pipeline.py
+import threading
+
+import pytest
+
+from app.services.frame_pipeline import FramePipeline, iter_frame_batches
+from app.services.video_processor import extract_frames
+
+
+def _grey_level(frame_number, frame_bgr, frame_rgb, fps):
+    """Consumer returning the frame index and the index encoded in its pixels"""
+    return frame_number, int(round(float(frame_rgb.mean()) / 8))
+
+
+class TestFramePipeline:
+    @pytest.mark.parametrize("prefetch", [0, 2, 8])
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_frames_reach_consumers_in_order(self, sample_video, prefetch, parallel):
+        pipeline = FramePipeline(sample_video, prefetch=prefetch)
+        first, second = pipeline.run([_grey_level, _grey_level], parallel=parallel)
+
+        expected = [(i, i) for i in range(24)]
+        assert first == expected
+        assert second == expected
+        assert pipeline.fps == pytest.approx(25.0)
+
+    def test_first_consumer_stays_on_calling_thread(self, sample_video):
+        thread_of = lambda *args: threading.get_ident()
+        first, second = FramePipeline(sample_video).run([thread_of, thread_of], parallel=True)
+
+        assert set(first) == {threading.get_ident()}
+        assert threading.get_ident() not in second
+
+    def test_consumer_error_stops_the_reader(self, sample_video):
+        threads_before = set(threading.enumerate())
+
+        def failing(frame_number, *args):
+            if frame_number == 3:
+                raise RuntimeError("consumer failed")
+            return frame_number
+
+        with pytest.raises(RuntimeError, match="consumer failed"):
+            FramePipeline(sample_video, prefetch=2).run([failing, _grey_level], parallel=True)
+
+        # Reader thread and consumer pool are joined before the error propagates
+        assert set(threading.enumerate()) <= threads_before
+
+    def test_closing_frames_early_stops_the_reader(self, sample_video):
+        threads_before = set(threading.enumerate())
+
+        frames = FramePipeline(sample_video, prefetch=2).frames()
+        numbers = [frame_number for _, (frame_number, _, _) in zip(range(5), frames)]
+        frames.close()
+
+        assert numbers == [0, 1, 2, 3, 4]
+        assert set(threading.enumerate()) <= threads_before
+
+
+class TestFrameBatches:
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_batches_cover_the_video(self, sample_video, prefetch):
+        levels = [
+            [int(round(float(frame.mean()) / 8)) for frame in batch]
+            for batch in iter_frame_batches(sample_video, batch_size=10, prefetch=prefetch)
+        ]
+        assert levels == [list(range(10)), list(range(10, 20)), list(range(20, 24))]
+
+    def test_closing_batches_early_stops_the_reader(self, sample_video):
+        threads_before = set(threading.enumerate())
+
+        batches = iter_frame_batches(sample_video, batch_size=4, prefetch=2)
+        first = next(batches)
+        batches.close()
+
+        assert len(first) == 4
+        assert set(threading.enumerate()) <= threads_before
+
+    def test_extract_frames_keeps_every_interval(self, sample_video):
+        frames = extract_frames(sample_video, interval=5)
+
+        assert frames.shape == (5, 48, 64, 3)
+        assert [int(round(float(frame.mean()) / 8)) for frame in frames] == [0, 5, 10, 15, 20]
@@ -0,0 +1,71 @@
+# tests/test_kernels.py
+import numpy as np
+import pytest
+
+from app.services import pose_service
+from app.services._bowling_kernels import (
+    VERDICT_ELBOW_ILLEGAL, VERDICT_ELBOW_WARNING, VERDICT_NO_BALL, bowling_verdict, release_consistency
+)
+
+
+def _python(kernel):
+    """Plain-Python version of an njit kernel (what runs without numba)"""
+    return getattr(kernel, "py_func", kernel)
+
+
+def _landmark_stack(n=64, seed=0):
+    rng = np.random.default_rng(seed)
+    L = rng.random((n, pose_service.NUM_LANDMARKS, 4), dtype=np.float32)
+    # Zero-length left upper arm on one frame: the angle is undefined (NaN)
+    L[0, pose_service.SHOULDER_L, :2] = L[0, pose_service.ELBOW_L, :2]
+    L[0, [pose_service.SHOULDER_L, pose_service.ELBOW_L, pose_service.WRIST_L], 3] = 1.0
+    return L
+
+
+class TestReleaseConsistency:
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(1)
+        angles = rng.uniform(0, 180, 200)
+        angles[::17] = np.nan
+        wrists = rng.random((200, 3))
+        valid = rng.random(200) > 0.2
+
+        selected = valid & (angles < 40.0)
+        for kernel in (release_consistency, _python(release_consistency)):
+            idx, x_std, y_std = kernel(angles, wrists, valid, 40.0)
+            np.testing.assert_array_equal(idx, np.flatnonzero(selected))
+            assert x_std == pytest.approx(np.std(wrists[selected, 0]))
+            assert y_std == pytest.approx(np.std(wrists[selected, 1]))
+
+    def test_no_release_frames(self):
+        idx, x_std, y_std = release_consistency(np.full(5, 90.0), np.zeros((5, 3)), np.ones(5, dtype=bool), 40.0)
+        assert len(idx) == 0 and x_std == 0.0 and y_std == 0.0
+
+
+class TestPoseMetricsBatch:
+    def test_kernel_matches_numpy_fallback(self, monkeypatch):
+        L = _landmark_stack()
+        detector = pose_service.pose_detector
+
+        monkeypatch.setattr(pose_service, "NUMBA_AVAILABLE", True)
+        kernel = detector._calculate_metrics_batch(L)
+        monkeypatch.setattr(pose_service, "NUMBA_AVAILABLE", False)
+        fallback = detector._calculate_metrics_batch(L)
+
+        assert list(kernel) == list(fallback)
+        for name in kernel:
+            np.testing.assert_allclose(kernel[name], fallback[name], rtol=1e-4, atol=1e-3, equal_nan=True)
+        assert np.isnan(kernel["left_elbow_angle"][0])
+
+
+class TestBowlingVerdict:
+    @pytest.mark.parametrize("elbow_ext, no_ball, expected", [
+        (5.0, False, 0),
+        (12.0, False, VERDICT_ELBOW_WARNING),
+        (16.0, False, VERDICT_ELBOW_ILLEGAL),
+        (5.0, True, VERDICT_NO_BALL),
+        (16.0, True, VERDICT_ELBOW_ILLEGAL | VERDICT_NO_BALL),
+    ])
+    def test_compiled_matches_python(self, elbow_ext, no_ball, expected):
+        assert bowling_verdict(elbow_ext, no_ball, 15.0, 10.0) == expected
+        assert _python(bowling_verdict)(elbow_ext, no_ball, 15.0, 10.0) == expected
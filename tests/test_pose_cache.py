@@ -0,0 +1,48 @@
+# tests/test_pose_cache.py
+import numpy as np
+
+from app.services.pose_cache import PoseCache
+
+
+def _report():
+    landmarks = np.random.default_rng(0).random((33, 4), dtype=np.float32)
+    return {
+        "metadata": {"total_frames": 2, "fps": 25.0, "duration_seconds": 0.08},
+        "frames": [
+            {"frame_number": 0, "timestamp": 0.0, "landmarks": landmarks,
+             "metrics": {"left_elbow_angle": 91.5, "shoulder_alignment": np.float32(0.25)}},
+            {"frame_number": 1, "timestamp": 0.04, "landmarks": np.zeros((0, 4), dtype=np.float32)},
+        ],
+        "summary": {"average_elbow_angles": {"left_elbow": 91.5, "right_elbow": 0}},
+    }
+
+
+class TestPoseCache:
+    def test_round_trip(self, tmp_path, sample_video):
+        cache = PoseCache(str(tmp_path / "cache"))
+        key = cache.key(sample_video, "pose_landmarker.task")
+        report = _report()
+
+        assert cache.get(key) is None
+        cache.put(key, report)
+        cached = cache.get(key)
+
+        assert cached["metadata"] == report["metadata"]
+        assert cached["summary"] == report["summary"]
+        for got, want in zip(cached["frames"], report["frames"]):
+            assert got["landmarks"].dtype == np.float32
+            assert got["landmarks"].shape == want["landmarks"].shape
+            np.testing.assert_array_equal(got["landmarks"], want["landmarks"])
+        assert cached["frames"][0]["metrics"] == {"left_elbow_angle": 91.5, "shoulder_alignment": 0.25}
+
+    def test_key_depends_on_detector(self, tmp_path, sample_video):
+        cache = PoseCache(str(tmp_path))
+        assert cache.key(sample_video, "lite.task") != cache.key(sample_video, "heavy.task")
+        assert cache.key(sample_video, "lite.task") == cache.key(sample_video, "lite.task")
+
+    def test_unreadable_entry_is_a_miss(self, tmp_path, sample_video):
+        cache = PoseCache(str(tmp_path))
+        key = cache.key(sample_video)
+        with open(cache._path(key), "wb") as f:
+            f.write(b"not a cache entry")
+        assert cache.get(key) is None